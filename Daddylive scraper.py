@@ -1,9 +1,11 @@
 from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-import os
 import json
 import fetcher
+import m3u
+import metrics
+import epgindex
 import tvlogo  # Assuming this is the module that handles tv logo extraction
+from atomicfile import AtomicFile
 
 daddyLiveChannelsFileName = '247channels.html'
 daddyLiveChannelsURL = 'https://thedaddy.to/24-7-channels.php'
@@ -11,8 +13,9 @@ daddyLiveChannelsURL = 'https://thedaddy.to/24-7-channels.php'
 tvLogosFilename = 'tvlogos.html'
 tvLogosURL = 'https://github.com/tv-logo/tv-logos/tree/main/countries/united-states'
 
-matches = []
+epgIndexFilename = 'epg-index.json'
 
+@metrics.timed()
 def search_streams(file_path):
     """
     Scrapes all streams from a file without filtering by keyword.
@@ -39,41 +42,6 @@ def search_streams(file_path):
 
     return matches
 
-def search_channel_ids(file_path, idMatches):
-    """
-    Scrapes all channel IDs without filtering by search string.
-    """
-    try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-
-        for channel in root.findall('.//channel'):
-            channel_id = channel.get('id')
-            if channel_id and channel_id not in [entry['id'] for entry in idMatches]:
-                idMatches.append({'id': channel_id, 'source': file_path})
-
-    except FileNotFoundError:
-        print(f'The file {file_path} does not exist.')
-    except ET.ParseError:
-        print(f'The file {file_path} is not a valid XML file.')
-
-    return idMatches
-
-def delete_file_if_exists(file_path):
-    """
-    Checks if a file exists and deletes it if it does.
-    """
-    if os.path.isfile(file_path):
-        os.remove(file_path)
-        print(f'File {file_path} deleted.')
-        return True
-    else:
-        print(f'File {file_path} does not exist.')
-        return False
-
-delete_file_if_exists('out.m3u8')
-delete_file_if_exists('tvg-ids.txt')
-
 epgs = [
     {'filename': 'epgShare1.xml', 'url': 'https://www.dropbox.com/scl/fi/7r7h1jdufwoplnhhxkism/m3u4u-103216-593044-EPG.xml?rlkey=606vswc00na76l51otnz116ed&st=q273qocn&dl=1'},
     {'filename': 'epgShare2.xml', 'url': 'https://www.dropbox.com/scl/fi/tsj8796ea6krin4pv4t32/m3u4u-103216-595541-EPG.xml?rlkey=tu42144366j5w0n2s8fc1ogvp&st=2gg7ylx2&dl=1'},
@@ -115,46 +83,70 @@ epgs = [
     {'filename': 'epgShare38.xml', 'url': 'https://epg.pw/api/epg.xml?channel_id=9206'}
 ]
 
-fetcher.fetchHTML(daddyLiveChannelsFileName, daddyLiveChannelsURL)
-fetcher.fetchHTML(tvLogosFilename, tvLogosURL)
+def channel_search_word(name):
+    return name.lower().replace('channel', '').replace('hdtv', '').replace('tv','').replace(' hd', '').replace('2','').replace('sports','').replace('1','').replace('usa','')
+
+@metrics.timed()
+def match_channels(matches, idIndex, logoIndex, payload, out_file='out.m3u8', ids_file='tvg-ids.txt'):
+    """
+    Writes a playlist entry for every stream whose name matches an EPG
+    channel id, and the list of matched ids.
 
-for epg in epgs:
-    fetcher.fetchXML(epg['filename'], epg['url'])
+    Parameters:
+    matches (list): (stream number, stream name) tuples from search_streams.
+    idIndex (epgindex.EpgIdIndex): EPG channel ids by normalized name.
+    logoIndex (tvlogo.LogoSearchIndex): Logo search index of the payload.
+    payload (dict): The tv-logos payload, for its initial_path.
 
-# Fetch all streams without the need for search terms
-matches = search_streams(daddyLiveChannelsFileName)
+    Returns:
+    int: The number of playlist entries written.
+    """
+    writtenIds = set()
+    initialPath = payload.get('initial_path')
+    with m3u.Writer(out_file, spacer=True) as playlist, AtomicFile(ids_file) as ids:
+        for channel in matches:
+            word = channel_search_word(channel[1])
+            possibleIds = [{'id': channelId, 'source': idIndex.source(channelId)} for channelId in idIndex.lookup(word)]
 
-payload = tvlogo.extract_payload_from_file(tvLogosFilename)
-print(json.dumps(payload, indent=2))
+            logoMatches = logoIndex.search(word, limit=1)
 
-# Example usage with search_channel_ids function
-idMatches = []
-for epg in epgs:
-    idMatches = search_channel_ids(epg['filename'], idMatches)
+            channelID = possibleIds[0] if possibleIds else None
 
-for channel in matches:
-    word = channel[1].lower().replace('channel', '').replace('hdtv', '').replace('tv','').replace(' hd', '').replace('2','').replace('sports','').replace('1','').replace('usa','')
-    possibleIds = []
+            if channelID:
+                tvicon = logoMatches[0] if logoMatches else {'id': {'path': ''}}
+                logo = f'https://raw.githubusercontent.com{initialPath}{tvicon["id"]["path"]}'
+                playlist.add({'tvg-id': channelID["id"], 'tvg-name': channel[1], 'tvg-logo': logo, 'group-title': 'USA (DADDY LIVE)'},
+                             channel[1], f"https://xyzdddd.mizhls.ru/lb/premium{channel[0]}/index.m3u8")
 
-    # Directly skip the user input question for all channels.
-    print("Searching for matches...")
-    for epg in epgs:
-        idMatches = search_channel_ids(epg['filename'], idMatches)  # Correctly call the function with 2 arguments
+                if channelID["id"] not in writtenIds:
+                    writtenIds.add(channelID["id"])
+                    ids.write(f'{channelID["id"]}\n')
 
-    matches = tvlogo.search_tree_items(word, payload)
+    return playlist.count
 
-    channelID = possibleIds[0] if possibleIds else None
+def main():
+    fetcher.fetchHTML(daddyLiveChannelsFileName, daddyLiveChannelsURL)
+    fetcher.fetchHTML(tvLogosFilename, tvLogosURL)
 
-    if channelID:
-        tvicon = possibleIds[0] if possibleIds else {'id': {'path': ''}}
+    fetcher.fetchXMLs(epgs)
 
-        with open("out.m3u8", 'a', encoding='utf-8') as file:  # Use 'a' mode for appending
-            initialPath = payload.get('initial_path')
-            file.write(f'#EXTINF:-1 tvg-id="{channelID["id"]}" tvg-name="{channel[1]}" tvg-logo="https://raw.githubusercontent.com{initialPath}{tvicon["id"]["path"]}" group-title="USA (DADDY LIVE)", {channel[1]}\n')
-            file.write(f"https://xyzdddd.mizhls.ru/lb/premium{channel[0]}/index.m3u8\n")
-            file.write('\n')
+    # Fetch all streams without the need for search terms
+    matches = search_streams(daddyLiveChannelsFileName)
+
+    payload = tvlogo.extract_payload_from_file(tvLogosFilename)
+    print(json.dumps(payload, indent=2))
+
+    # Index the logo names once; every channel below is a lookup
+    logoIndex = tvlogo.LogoSearchIndex.from_payload(payload)
+
+    # Build the EPG channel-id index once (or reuse it when the EPG files are unchanged)
+    idIndex = epgindex.build_index([epg['filename'] for epg in epgs], epgIndexFilename)
+
+    print("Searching for matches...")
+    match_channels(matches, idIndex, logoIndex, payload)
 
-        with open("tvg-ids.txt", 'a', encoding='utf-8') as file:  # Use 'a' mode for appending
-            file.write(f'{channelID["id"]}\n')
+    print("Number of Streams: ", len(matches))
 
-print("Number of Streams: ", len(matches))
+if __name__ == '__main__':
+    with metrics.run('daddylive_scraper'):
+        main()
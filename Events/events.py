@@ -10,16 +10,31 @@ events.py — live-events playlist builder
 
 from __future__ import annotations
 import argparse
-import base64
+import bisect
+import contextlib
 import difflib
+import hashlib
+import json
 import logging
+import mmap
+import os
 import re
+import struct
+import sys
 import time
 import unicodedata
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from array import array
+from collections import Counter, defaultdict
 import requests
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import downloader
+import m3u
+import metrics
+import mirrors
+import profiling
+import streamstore
+
 # ═════════════════════════════ constants ═══════════════════════════════════
 SCHEDULE_URL   = "https://daddylive.dad/schedule/schedule-generated.php"
 PROXY_PREFIX   = "https://josh9456-myproxy.hf.space/watch/"
@@ -30,6 +45,11 @@ EPG_XML_URL    = "https://epgshare01.online/epgshare01/epg_ripper_ALL_SOURCES1.x
 
 TVLOGO_RAW     = "https://raw.githubusercontent.com/tv-logo/tv-logos/main/countries/"
 TVLOGO_API     = "https://api.github.com/repos/tv-logo/tv-logos/contents/countries"
+NO_LOGO        = f"{TVLOGO_RAW}misc/no-logo.png"
+LOGO_INDEX_FILE    = "logo_index.json"
+LOGO_INDEX_VERSION = 1
+LOGO_WORKERS       = 8
+LOGO_SUFFIXES      = ("-us", "-uk", "-ca", "-au", "-de", "-fr", "-es", "-it")
 
 URL_TEMPLATES = [
     "https://nfsnew.newkso.ru/nfs/premium{num}/mono.m3u8",
@@ -84,58 +104,341 @@ ABBR_MAP = {
     "nw":     "network",
 }
 
+# Words generate_brand_variations() turns into digits, and network names it
+# also tries without their space
+NUMBER_WORDS = {'one': '1', 'two': '2', 'three': '3', 'four': '4'}
+NETWORKS = {'espn': 'espn', 'fox sports': 'foxsports',
+            'sky sports': 'skysports', 'tnt sports': 'tntsports',
+            'bein sports': 'beinsports'}
+
 # ═════════════════════════════ helpers ═════════════════════════════════════
+class LabelScanner:
+    """
+    Finds every label of a fixed list that occurs in a string with one
+    compiled alternation, tried longest first. The search restarts one
+    character after each hit, so overlapping labels are all seen, and the
+    labels that are prefixes of a hit (“can” in “canada”) occur at the same
+    place and come from a table built up front.
+    """
+    def __init__(self, labels):
+        self.index = {label: i for i, label in enumerate(dict.fromkeys(labels))}
+        ordered = sorted(self.index, key=len, reverse=True)
+        self.search = re.compile("|".join(map(re.escape, ordered))).search
+        self.prefixes = {label: tuple(p for p in self.index if label.startswith(p)) for label in ordered}
+
+    def find(self, text: str) -> tuple[str, ...]:
+        """Labels occurring in text, in the order they were given."""
+        m = self.search(text)
+        if m is None:
+            return ()
+        labels = self.prefixes[m.group()]
+        m = self.search(text, m.start() + 1)
+        if m is None:           # the usual case: one hit, already in order
+            return labels
+        found = set(labels)
+        while m is not None:
+            found.update(self.prefixes[m.group()])
+            m = self.search(text, m.start() + 1)
+        return tuple(sorted(found, key=self.index.__getitem__))
+
+_PARENS_COUNTRY  = re.compile(r'^(.*?)\s*\(([^)]+)\)$')
+_COUNTRY_LABELS  = LabelScanner(COUNTRY_CODES)
+_COUNTRY_WORDS   = {label: re.compile(rf'\b{re.escape(label)}\b', re.I) for label in COUNTRY_CODES}
+_COUNTRY_MAX_LEN = max(len(label.split()) for label in COUNTRY_CODES)
+_FILLER_WORDS    = re.compile(r'\b(tv|hd|sd|channel|network|sports?|news)\b')
+_BRAND_WORDS     = {**NUMBER_WORDS, **NETWORKS}     # one scan for both
+_BRAND_LABELS    = LabelScanner(_BRAND_WORDS)
+_ABBR_LABELS     = LabelScanner(ABBR_MAP)
+_ABBR_LONG       = {full: ab for ab, full in ABBR_MAP.items()}
+_LONG_LABELS     = LabelScanner(_ABBR_LONG)
+
 def extract_channel_info(name: str) -> tuple[str, str]:
     """
     Return (brand, ISO-2 country) from strings like
     “Sky Sports Racing UK”, “BBC Two (UK)”, …
     """
     name = name.strip()
-    m = re.search(r'^(.*?)\s*\(([^)]+)\)$', name)
+    m = _PARENS_COUNTRY.search(name) if name.endswith(')') else None
     if m:
         country = COUNTRY_CODES.get(m.group(2).lower(), 'unknown')
         return m.group(1).strip(), country
 
+    # trailing country, shortest suffix first; no label is longer than
+    # _COUNTRY_MAX_LEN words
     parts = name.split()
-    for i in range(len(parts) - 1, 0, -1):
+    for i in range(len(parts) - 1, max(0, len(parts) - _COUNTRY_MAX_LEN - 1), -1):
         maybe = ' '.join(parts[i:]).lower()
         if maybe in COUNTRY_CODES:
             return ' '.join(parts[:i]).strip(), COUNTRY_CODES[maybe]
-    lower = name.lower()
-    for label, code in COUNTRY_CODES.items():
-        if label in lower:
-            brand = re.sub(rf'\b{re.escape(label)}\b', '', name, flags=re.I)
-            return brand.strip(), code
+
+    # else the first COUNTRY_CODES label found anywhere in the name
+    labels = _COUNTRY_LABELS.find(name.lower())
+    if labels:
+        brand = _COUNTRY_WORDS[labels[0]].sub('', name)
+        return brand.strip(), COUNTRY_CODES[labels[0]]
     return name, 'unknown'
 
 # ── abbreviation utils ────────────────────────────────────────────────────
 def _expand_abbr(slug: str) -> list[str]:
     res = {slug}
-    for ab, full in ABBR_MAP.items():
-        if ab in slug:
-            res.add(slug.replace(ab, full))
+    for ab in _ABBR_LABELS.find(slug):
+        res.add(slug.replace(ab, ABBR_MAP[ab]))
     return list(res)
 
 def _compress_long(slug: str) -> list[str]:
     res = {slug}
-    for ab, full in ABBR_MAP.items():
-        if full in slug:
-            res.add(slug.replace(full, ab))
+    for full in _LONG_LABELS.find(slug):
+        res.add(slug.replace(full, _ABBR_LONG[full]))
     return list(res)
 
+# ── fuzzy key index ────────────────────────────────────────────────────────
+FUZZY_CUTOFF     = 0.60
+
+class FuzzyIndex:
+    """
+    Exact replacement for difflib.get_close_matches(query, keys, n=1,
+    cutoff) over the lookup keys (len ≥ 4), built once. Keys are sorted by
+    length and posted under every (char, nth occurrence) they contain, so
+    counting a query's postings inside the length band that can still
+    reach the cutoff gives each key difflib's quick_ratio bound. Keys are
+    then scored with difflib's ratio in falling bound order, stopping once
+    no bound can beat the best (ratio, key) – the same winner, tie-break
+    and cutoff as the full scan.
+    """
+    def __init__(self, keys):
+        self.keys: list[str] = sorted((k for k in keys if len(k) >= 4), key=len)
+        self.lengths: list[int] = [len(k) for k in self.keys]
+        self.postings: dict[tuple[str, int], array] = defaultdict(lambda: array("I"))
+        for i, key in enumerate(self.keys):
+            seen: dict[str, int] = {}
+            for ch in key:
+                nth = seen[ch] = seen.get(ch, 0) + 1
+                self.postings[ch, nth].append(i)
+
+    def best(self, query: str, cutoff: float = FUZZY_CUTOFF) -> str | None:
+        # real_quick_ratio = 2·min(len) / (len(a)+len(b)) bounds the length
+        n  = len(query)
+        lo = bisect.bisect_left(self.lengths, int(n * cutoff / (2 - cutoff)))
+        hi = bisect.bisect_right(self.lengths, -int(-n * (2 - cutoff) // cutoff))
+
+        # quick_ratio: matching characters counted with multiplicity
+        hits: Counter[int] = Counter()
+        for (ch, count) in Counter(query).items():
+            for nth in range(1, count + 1):
+                posting = self.postings.get((ch, nth))
+                if posting:
+                    hits.update(posting[bisect.bisect_left(posting, lo):bisect.bisect_left(posting, hi)])
+
+        keys = self.keys
+        bounds = []
+        for i, m in hits.items():
+            bound = 2.0 * m / (n + len(keys[i]))
+            if bound >= cutoff:
+                bounds.append((bound, keys[i]))
+        bounds.sort(reverse=True)
+
+        best = None
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        for bound, key in bounds:
+            if best is not None and (bound, key) < best:
+                break
+            matcher.set_seq1(key)
+            ratio = matcher.ratio()
+            if ratio >= cutoff and (best is None or (ratio, key) > best):
+                best = (ratio, key)
+        return best[1] if best else None
+
+# ── compact EPG lookup table ──────────────────────────────────────────────
+COUNTRY_PRIO     = ['uk', 'gb', 'ie', 'us', 'ca', 'au']
+EPG_LOOKUP_FILE  = "epg_lookup.bin"
+EPG_LOOKUP_TTL   = 12 * 3600
+
+class EpgLookup:
+    """
+    alias → raw-id table packed into flat uint32 arrays:
+
+      ids       every raw id once (interned), with its parsed country
+      keys      sorted aliases, binary-searched
+      postings  per alias: id numbers grouped by country, original order
+                within a country, so “first id from country X” is a bisect
+      best/first per alias: precomputed country-ranked pick and first id
+
+    The same layout is what save() writes, so load() just mmaps the file.
+    A lazily built FuzzyIndex and a per-name memo ride along.
+    """
+    MAGIC   = b"EPGL"
+    VERSION = 1
+    _HEADER = struct.Struct("=4sIIIIIIII")   # magic ver bom n_ids n_keys n_post n_cc ids_len keys_len
+
+    def __init__(self, buf: bytes | mmap.mmap | None = None):
+        if buf is None:
+            buf = self._pack([], [], {})
+        magic, ver, bom, n_ids, n_keys, n_post, n_cc, ids_len, keys_len = \
+            self._HEADER.unpack_from(buf, 0)
+        if magic != self.MAGIC or ver != self.VERSION or bom != 0x01020304:
+            raise ValueError("not an EPG lookup file")
+
+        self._buf = buf
+        mv, pos = memoryview(buf), self._HEADER.size
+
+        def take(count: int) -> memoryview:
+            nonlocal pos
+            view = mv[pos:pos + 4 * count].cast("I")
+            pos += 4 * count
+            return view
+
+        self._id_off    = take(n_ids + 1)
+        self._id_cc     = take(n_ids)
+        self._key_off   = take(n_keys + 1)
+        self._post_off  = take(n_keys + 1)
+        self._best      = take(n_keys)
+        self._first     = take(n_keys)
+        self._postings  = take(n_post)
+        self._cc_off    = take(n_cc + 1)
+        self._ids_at    = pos
+        self._keys_at   = pos + ids_len
+        self._cc_at     = pos + ids_len + keys_len
+        self._countries = [self._str(self._cc_at, self._cc_off, i) for i in range(n_cc)]
+        self._cc_index  = {c: i for i, c in enumerate(self._countries)}
+        self._n_keys    = n_keys
+        self._fuzzy: FuzzyIndex | None = None
+        self.memo: dict[str, str] = {}
+
+    # ── packing ──
+    @classmethod
+    def _pack(cls, ids: list[str], id_cc: list[str], table: dict[str, list[int]]) -> bytes:
+        countries = sorted(set(id_cc))                        # "" (no country) sorts first
+        cc_index  = {c: i for i, c in enumerate(countries)}
+        cc_of     = [cc_index[c] for c in id_cc]
+        rank      = {c: i for i, c in enumerate(COUNTRY_PRIO)}
+
+        items = sorted((k.encode(), plist) for k, plist in table.items())
+        key_off, post_off, best, first = [0], [0], [], []
+        postings = array("I")
+        for _, plist in items:
+            ranked = [p for p in plist if id_cc[p] in rank]
+            best.append(min(ranked, key=lambda p: rank[id_cc[p]]) if ranked else plist[0])
+            first.append(plist[0])
+            postings.extend(sorted(plist, key=cc_of.__getitem__))   # stable
+            post_off.append(len(postings))
+
+        def blob(strings: list[bytes], offsets: list[int]) -> bytes:
+            for b in strings:
+                offsets.append(offsets[-1] + len(b))
+            return b"".join(strings)
+
+        id_off, cc_off = [0], [0]
+        ids_blob  = blob([i.encode() for i in ids], id_off)
+        keys_blob = blob([k for k, _ in items], key_off)
+        cc_blob   = blob([c.encode() for c in countries], cc_off)
+
+        header = cls._HEADER.pack(cls.MAGIC, cls.VERSION, 0x01020304, len(ids), len(items),
+                                  len(postings), len(countries), len(ids_blob), len(keys_blob))
+        arrays = [array("I", a) for a in (id_off, cc_of, key_off, post_off, best, first)]
+        arrays += [postings, array("I", cc_off)]
+        return header + b"".join(a.tobytes() for a in arrays) + ids_blob + keys_blob + cc_blob
+
+    @classmethod
+    def build(cls, ids: list[str], id_cc: list[str], table: dict[str, list[int]]) -> EpgLookup:
+        return cls(cls._pack(ids, id_cc, table))
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fp:
+            fp.write(self._buf)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> EpgLookup:
+        with open(path, "rb") as fp:
+            return cls(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+    # ── access ──
+    def _str(self, base: int, offsets: memoryview, i: int) -> str:
+        return self._buf[base + offsets[i]:base + offsets[i + 1]].decode()
+
+    def _raw(self, p: int) -> str:
+        return self._str(self._ids_at, self._id_off, p)
+
+    def _key(self, i: int) -> bytes:
+        return self._buf[self._keys_at + self._key_off[i]:self._keys_at + self._key_off[i + 1]]
+
+    def _find(self, key: str) -> int | None:
+        k = key.encode()
+        lo, hi = 0, self._n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < k:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._n_keys and self._key(lo) == k else None
+
+    def __len__(self) -> int:
+        return self._n_keys
+
+    def __iter__(self):
+        return (self._key(i).decode() for i in range(self._n_keys))
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def __getitem__(self, key: str) -> list[str]:
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return [self._raw(p) for p in self._postings[self._post_off[i]:self._post_off[i + 1]]]
+
+    def first(self, key: str) -> str | None:
+        i = self._find(key)
+        return None if i is None else self._raw(self._first[i])
+
+    def best(self, key: str, prefer: str | None = None) -> str | None:
+        """
+        Same pick as ranking the alias's ids by country: an id from
+        `prefer` if any, else the first of uk/gb/ie/us/ca/au, else the first.
+        """
+        i = self._find(key)
+        if i is None:
+            return None
+        c = self._cc_index.get(prefer) if prefer else None
+        if c is not None:
+            lo, hi = self._post_off[i], self._post_off[i + 1]
+            j = bisect.bisect_left(self._postings, c, lo, hi, key=self._id_cc.__getitem__)
+            if j < hi and self._id_cc[self._postings[j]] == c:
+                return self._raw(self._postings[j])
+        return self._raw(self._best[i])
+
+    @property
+    def fuzzy(self) -> FuzzyIndex:
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(self)
+        return self._fuzzy
+
 # ── EPG lookup build ───────────────────────────────────────────────────────
-def build_epg_lookup(lines: list[str]) -> dict[str, list[str]]:
+def build_epg_lookup(lines: list[str]) -> EpgLookup:
     """
     For every EPG line create MANY aliases, so
       TNT.Sports.4.HD.uk  →  tnt sports 4 hd, tnt sports 4, tnt sports …
     All aliases also exist with the country suffix: “… uk”.
+    Raw ids are interned once; aliases hold de-duplicated id numbers.
     """
-    table: dict[str, list[str]] = defaultdict(list)
+    ids: list[str] = []
+    id_cc: list[str] = []
+    seen: set[str] = set()
+    table: dict[str, list[int]] = defaultdict(list)
+
+    def post(key: str, n: int) -> None:
+        plist = table[key]
+        if not plist or plist[-1] != n:
+            plist.append(n)
 
     for line in lines:
         raw = line.strip()
-        if not raw or raw.startswith("#"):
+        if not raw or raw.startswith("#") or raw in seen:
             continue
+        seen.add(raw)
 
         # split “… .uk”  or keep whole line if no country code
         parts    = raw.split(".")
@@ -145,62 +448,50 @@ def build_epg_lookup(lines: list[str]) -> dict[str, list[str]]:
         brand_cl = re.sub(r"[^a-z0-9 ]", " ", brand_sp.lower())
         brand_cl = re.sub(r"\s+", " ", brand_cl).strip()      # normalised
 
+        n = len(ids)
+        ids.append(raw)
+        id_cc.append(country or "")
+
         # progressive prefixes:  "tnt sports 4 hd" →  full, drop "hd", drop "4", …
         words = brand_cl.split()
         for i in range(len(words), 0, -1):
             frag = " ".join(words[:i])
             for key in (frag, frag.replace(" ", "")):         # spaced and slug form
-                table[key].append(raw)
+                post(key, n)
                 if country:
-                    table[f"{key}.{country}"].append(raw)
+                    post(f"{key}.{country}", n)
 
         # original full lower-cased line for safety
-        table[raw.lower()].append(raw)
+        post(raw.lower(), n)
 
-    return table
+    return EpgLookup.build(ids, id_cc, table)
 
 # ── brand variation generator ──────────────────────────────────────────────
 def generate_brand_variations(brand: str) -> list[str]:
     out: set[str] = set()
     b = brand.lower()
 
-    out.add(re.sub(r'\b(tv|hd|sd|channel|network|sports?|news)\b', '', b).strip())
-    num = {'one':'1','two':'2','three':'3','four':'4'}
-    for word,dig in num.items():
-        if word in b:
-            out.add(b.replace(word, dig))
+    out.add(_FILLER_WORDS.sub('', b).strip())
+    # number words and network names, in the order of NUMBER_WORDS, NETWORKS
+    for word in _BRAND_LABELS.find(b):
+        out.add(b.replace(word, _BRAND_WORDS[word]))
     if 'sports' in b:
         out.add(b.replace('sports', 'sport'))
     if 'sport' in b and 'sports' not in b:
         out.add(b.replace('sport', 'sports'))
 
-    nets = {'espn':'espn', 'fox sports':'foxsports',
-            'sky sports':'skysports', 'tnt sports':'tntsports',
-            'bein sports':'beinsports'}
-    for full, short in nets.items():
-        if full in b:
-            out.add(b.replace(full, short))
-
     slug = b.replace(' ', '')
     out |= set(_compress_long(slug))
     out.add(slug)
     return [v for v in out if v]
 
-# ── country ranking for competing IDs ──────────────────────────────────────
-def _best_by_country(matches: list[str], prefer: str | None) -> str:
-    if prefer:
-        for m in matches:
-            if m.lower().endswith(f".{prefer}"):
-                return m
-    prio = ['uk', 'gb', 'ie', 'us', 'ca', 'au']
-    for c in prio:
-        for m in matches:
-            if m.lower().endswith(f".{c}"):
-                return m
-    return matches[0]
-
 # ── EPG match ───────────────────────────────────────────────────────────────
-def find_best_epg_match(channel_name: str, lookup: dict[str, list[str]]) -> str:
+def find_best_epg_match(channel_name: str, lookup: EpgLookup) -> str:
+    if channel_name not in lookup.memo:
+        lookup.memo[channel_name] = _match_epg(channel_name, lookup)
+    return lookup.memo[channel_name]
+
+def _match_epg(channel_name: str, lookup: EpgLookup) -> str:
     brand, country = extract_channel_info(channel_name)
     brand_lc = brand.lower()
     slug     = brand_lc.replace(' ', '')
@@ -215,15 +506,16 @@ def find_best_epg_match(channel_name: str, lookup: dict[str, list[str]]) -> str:
         if country != 'unknown':
             keys.append(f"{v}.{country}")
 
+    prefer = None if country == 'unknown' else country
     for k in keys:
-        if k in lookup:
-            return _best_by_country(lookup[k], None if country=='unknown' else country)
+        hit = lookup.best(k, prefer)
+        if hit is not None:
+            return hit
 
     # fuzzy safety net
-    candidates = [k for k in lookup if len(k) >= 4]
-    best = difflib.get_close_matches(slug, candidates, n=1, cutoff=0.60)
+    best = lookup.fuzzy.best(slug)
     if best:
-        return lookup[best[0]][0]
+        return lookup.first(best)
     return ""
 
 # ═════ logo helpers ════════════════════════════════════════════════════════
@@ -233,22 +525,100 @@ def slugify(text: str) -> str:
     txt = re.sub(r"[^\w\s-]", "", txt)
     return re.sub(r"\s+", "-", txt).strip("-")
 
-def build_logo_index(sess: requests.Session) -> dict[str, str]:
+def _add_logo(index: dict[str, str], country: str, name: str) -> None:
+    base = name[:-4]
+    url  = f"{TVLOGO_RAW}{country}/{name}"
+    index.update({name: url, base: url})
+    for suf in LOGO_SUFFIXES:
+        if base.endswith(suf):
+            index[base[:-len(suf)]] = url
+
+def _is_logo(name: str) -> bool:
+    return name.endswith(".png")
+
+def _mirror_listing(mirror: str) -> list[tuple[str, list[str]]]:
+    """[(country, [png names]), …] from a local checkout of tv-logos."""
+    root = os.path.join(mirror, "countries")
+    if not os.path.isdir(root):
+        root = mirror
+    return [(c, sorted(f for f in os.listdir(os.path.join(root, c)) if _is_logo(f)))
+            for c in sorted(os.listdir(root)) if os.path.isdir(os.path.join(root, c))]
+
+def _api_listing(sess: requests.Session, cache_path: str) -> list[tuple[str, list[str]]]:
+    """
+    [(country, [png names]), …] from the GitHub contents API. The country
+    list is revalidated with its ETag (a 304 is free of rate limit) and a
+    country directory is only listed again when its tree SHA changed.
+    """
+    try:
+        with open(cache_path, encoding="utf-8") as fp:
+            cache = json.load(fp)
+        if cache.get("version") != LOGO_INDEX_VERSION:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    dirs = {c: (sha, files) for c, sha, files in cache.get("dirs", [])}
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if os.environ.get("GITHUB_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.environ['GITHUB_TOKEN']}"
+    if cache.get("etag") and dirs:
+        headers["If-None-Match"] = cache["etag"]
+
+    r = sess.get(TVLOGO_API, headers=headers, timeout=30)
+    if r.status_code == 304:
+        logging.info("✓ logo tree unchanged (%d countries cached)", len(dirs))
+        return [(c, files) for c, (_, files) in dirs.items()]
+    r.raise_for_status()
+    headers.pop("If-None-Match", None)
+
+    countries = [(d["name"], d["sha"]) for d in r.json() if d["type"] == "dir"]
+    stale     = [c for c, sha in countries if dirs.get(c, (None,))[0] != sha]
+    logging.info("Logo tree: %d countries, %d changed", len(countries), len(stale))
+
+    def list_country(c: str) -> list[str]:
+        resp = sess.get(f"{TVLOGO_API}/{c}", headers=headers, timeout=30)
+        resp.raise_for_status()
+        return [f["name"] for f in resp.json() if f["type"] == "file" and _is_logo(f["name"])]
+
+    listed = dict(zip(stale, downloader.fetch_all(stale, list_country, LOGO_WORKERS)))
+    fresh, etag = [], r.headers.get("ETag")
+    for c, sha in countries:
+        files = listed.get(c)
+        if c in listed and files is None:
+            # failed: keep the old listing and force a refetch next time
+            sha, files, etag = None, dirs.get(c, (None, []))[1], None
+        elif files is None:
+            files = dirs[c][1]
+        fresh.append((c, sha, files))
+
+    tmp = f"{cache_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump({"version": LOGO_INDEX_VERSION, "etag": etag, "dirs": fresh}, fp, separators=(",", ":"))
+    os.replace(tmp, cache_path)
+    return [(c, files) for c, _, files in fresh]
+
+@metrics.timed()
+def build_logo_index(sess: requests.Session | None = None, mirror: str | None = None,
+                     cache_path: str = LOGO_INDEX_FILE) -> dict[str, str]:
+    """
+    Logo file name / variant → raw.githubusercontent URL. Listed from a
+    local tv-logos checkout when `mirror` is given, else from the GitHub
+    API through the on-disk cache at `cache_path`.
+    """
     index: dict[str, str] = {}
     try:
-        countries = [d["name"] for d in sess.get(TVLOGO_API, timeout=30).json()
-                     if d["type"] == "dir"]
-        for c in countries:
-            r = sess.get(f"{TVLOGO_API}/{c}", timeout=30)
-            for f in r.json():
-                if f["type"] != "file" or not f["name"].endswith(".png"):
-                    continue
-                base = f["name"][:-4]
-                url  = f"{TVLOGO_RAW}{c}/{f['name']}"
-                index.update({f["name"]: url, base: url})
-                for suf in ("-us","-uk","-ca","-au","-de","-fr","-es","-it"):
-                    if base.endswith(suf):
-                        index[base[:-len(suf)]] = url
+        if mirror:
+            listing = _mirror_listing(mirror)
+        elif sess is None:
+            with requests.Session() as s:
+                s.hooks["response"].append(metrics.record_response)
+                listing = _api_listing(s, cache_path)
+        else:
+            listing = _api_listing(sess, cache_path)
+        for c, files in listing:
+            for name in files:
+                _add_logo(index, c, name)
     except Exception as e:
         logging.warning("logo index build failed: %s", e)
     logging.info("✓ %d logo variants", len(index))
@@ -256,16 +626,18 @@ def build_logo_index(sess: requests.Session) -> dict[str, str]:
 
 def find_best_logo(name: str, logos: dict[str, str]) -> str:
     if not logos:
-        return f"{TVLOGO_RAW}misc/no-logo.png"
+        return NO_LOGO
     slug = slugify(name)
     for var in (slug, slug + ".png", slug.replace("-hd",""), slug.replace("-sd","")):
         if var in logos:
             return logos[var]
-    return f"{TVLOGO_RAW}misc/no-logo.png"
+    return NO_LOGO
 
 # ═════ schedule / streams ══════════════════════════════════════════════════
+@metrics.timed()
 def get_schedule():
-    r = requests.get(SCHEDULE_URL, headers=HEADERS, timeout=15)
+    r = requests.get(SCHEDULE_URL, headers=HEADERS, timeout=15,
+                     hooks={"response": metrics.record_response})
     r.raise_for_status()
     return r.json()
 
@@ -296,103 +668,440 @@ def extract_channel_ids(schedule) -> set[str]:
     return out
 
 # stream validation ---------------------------------------------------------
-def validate_single(url: str) -> str | None:
-    for _ in range(3):
-        try:
-            r = requests.head(url, headers=HEADERS, timeout=10, allow_redirects=True)
-            if r.status_code == 200:
-                return url
-            if r.status_code in (404,410):
-                return None
-            if r.status_code == 429:
-                time.sleep(5); continue
-            r = requests.get(url, headers=HEADERS, timeout=10, stream=True)
-            if r.status_code == 200:
-                return url
-            if r.status_code in (404,410):
-                return None
-        except requests.RequestException:
-            return None
-    return None
-
-def build_stream_map(ids: set[str], workers: int = 30) -> dict[str, str]:
-    cand = {tpl.format(num=i): i for i in ids for tpl in URL_TEMPLATES}
-    id2url: dict[str, str] = {}
-    with ThreadPoolExecutor(workers) as pool:
-        futs = {pool.submit(validate_single, u): u for u in cand}
-        for fut in as_completed(futs):
-            url = fut.result()
-            if url:
-                id2url.setdefault(str(cand[url]), url)
+@metrics.timed()
+def build_stream_map(ids: set[str], store: streamstore.StreamStore | None = None,
+                     top_k: int = mirrors.TOP_K) -> dict[str, str]:
+    """
+    id → first working mirror. Mirrors are raced per id in store-ranked
+    order (top_k at a time) on the asyncio engine, with per-host rate
+    limiting and Retry-After/AIMD backoff; the rest are skipped once one
+    answers 200.
+    """
+    own_store = store is None
+    store = store or streamstore.StreamStore()
+    try:
+        found = mirrors.race_all(ids, store, URL_TEMPLATES, HEADERS, top_k=top_k)
+    finally:
+        if own_store:
+            store.close()
+    id2url = {str(cid): urls[0] for cid, urls in found.items() if urls}
     logging.info("✓ %d working streams", len(id2url))
     return id2url
 
 # ═════ main playlist build ═════════════════════════════════════════════════
-def make_playlist(schedule, streams, logos, epg_lookup):
-    lines = ["#EXTM3U", f'#EXTM3U url-tvg="{EPG_XML_URL}"']
+def playlist_rows(schedule) -> list[tuple[str, str, str, str]]:
+    """
+    (group, event title, channel name, channel id) in playlist order.
+    """
     grouped = defaultdict(list)
     for cats in schedule.values():
         for cat, events in cats.items():
             grouped[cat.upper()].extend(events)
 
-    total = epg_ok = 0
+    rows = []
     for group in sorted(grouped):
         for ev in grouped[group]:
-            title = ev["event"]
             for ch in _channel_entries(ev):
                 cname = ch["channel_name"] if isinstance(ch, dict) else str(ch)
-                cid   = _extract_cid(ch)
-                url   = streams.get(cid)
-                if not url:
-                    continue
-                total += 1
-                tvg_id = find_best_epg_match(cname, epg_lookup) or cid
-                if tvg_id != cid:
-                    epg_ok += 1
-                logo   = find_best_logo(cname, logos)
-                lines.append(
-                    f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-logo="{logo}" '
-                    f'group-title="{group}",{title} ({cname})'
-                )
-                lines.extend(VLC_HEADERS)
-                lines.append(f"{PROXY_PREFIX}{base64.b64encode(url.encode()).decode()}.m3u8")
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as fp:
-        fp.write('\n'.join(lines) + '\n')
+                rows.append((group, ev["event"], cname, _extract_cid(ch)))
+    return rows
+
+def resolve_channel(cname: str, logos, epg_lookup) -> tuple[str, str]:
+    """(matched tvg-id or "", logo url) for one channel name."""
+    with profiling.call("find_best_epg_match", cname):
+        match = find_best_epg_match(cname, epg_lookup) or ""
+    with profiling.call("find_best_logo", cname):
+        logo = find_best_logo(cname, logos)
+    return match, logo
+
+def channel_names(rows, streams) -> set[str]:
+    """Distinct channel names of the rows that have a working stream."""
+    return {cname for _, _, cname, cid in rows if cid in streams}
+
+@metrics.timed()
+def resolve_channels(names, logos, epg_lookup,
+                     resolved: dict[str, tuple[str, str]] | None = None) -> dict[str, tuple[str, str]]:
+    """
+    Matching stage: channel name → (tvg-id or "", logo) for every distinct
+    name, matched once however many events carry it. Names already in
+    `resolved` are kept as they are; the table is updated in place and
+    returned.
+    """
+    resolved = {} if resolved is None else resolved
+    todo = sorted(set(names) - resolved.keys())
+    for cname in todo:
+        resolved[cname] = resolve_channel(cname, logos, epg_lookup)
+    logging.info("Matched %d channel names", len(todo))
+    return resolved
+
+@metrics.timed()
+def build_entries(rows, streams, resolved: dict[str, tuple[str, str]]) -> list[m3u.Entry]:
+    """
+    Playlist entries for every row with a working stream, with the tvg-id
+    and logo of its channel name from the resolve_channels() table.
+    """
+    entries = []
+    epg_ok = 0
+    for group, title, cname, cid in rows:
+        url = streams.get(cid)
+        if not url:
+            continue
+        match, logo = resolved.get(cname) or ("", NO_LOGO)
+        tvg_id = match or cid
+        if tvg_id != cid:
+            epg_ok += 1
+        entries.append(m3u.Entry({"tvg-id": tvg_id, "tvg-logo": logo, "group-title": group},
+                                 f"{title} ({cname})", m3u.encode_proxy(url, PROXY_PREFIX),
+                                 VLC_HEADERS, target=url))
 
+    total = len(entries)
     pct = epg_ok / total * 100 if total else 0
     logging.info("Playlist %s   items:%d  epg:%d (%.1f%%)",
                  OUTPUT_FILE, total, epg_ok, pct)
+    return entries
+
+@metrics.timed()
+def write_playlist(entries: list[m3u.Entry], path: str = OUTPUT_FILE) -> None:
+    with m3u.Writer(path, header=["#EXTM3U", f'#EXTM3U url-tvg="{EPG_XML_URL}"']) as out:
+        for entry in entries:
+            out.write(entry)
+
+@metrics.timed()
+def make_playlist(schedule, streams, logos, epg_lookup):
+    rows = playlist_rows(schedule)
+    resolved = resolve_channels(channel_names(rows, streams), logos, epg_lookup)
+    write_playlist(build_entries(rows, streams, resolved))
+
+# ═════ checkpoints ═════════════════════════════════════════════════════════
+# Each stage of a run stores its result in CHECKPOINT_DIR, with a hash of
+# the inputs it was made from and a hash of its content. A run that dies
+# leaves run.json marked incomplete; the next run (within CHECKPOINT_TTL)
+# reuses every stage whose inputs and content still check out and carries
+# on from there. --from-stage re-runs one stage and everything after it on
+# top of the stored results of the stages before it, e.g. `--from-stage
+# match` after a change to the matching rules.
+CHECKPOINT_DIR     = "checkpoints"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_TTL     = 6 * 3600
+STAGES             = ("schedule", "streams", "logos", "epg", "match", "output")
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+def _write_bytes(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fp:
+        fp.write(data)
+    os.replace(tmp, path)
+
+class Checkpoints:
+    """
+    Stage results of one run. With directory=None nothing is stored and
+    every stage is computed.
+    """
+    def __init__(self, directory: str | None = CHECKPOINT_DIR, from_stage: str | None = None,
+                 resume: bool = True, now: float | None = None):
+        self.directory = directory
+        self.hashes: dict[str, str] = {}
+        # stage → content hash of the results from a previous run that may
+        # be used, and stages that must not reuse anything (not even the
+        # incremental state)
+        self.reuse: dict[str, str | None] = {}
+        self.forced: set[str] = set(STAGES[STAGES.index(from_stage):]) if from_stage else set()
+        if directory is None:
+            return
+
+        now = time.time() if now is None else now
+        os.makedirs(directory, exist_ok=True)
+        previous = self._read_json("run.json") or {}
+        started_at = now
+        if from_stage:
+            self.reuse = dict.fromkeys(STAGES[:STAGES.index(from_stage)])
+            logging.info("Re-running from stage %s", from_stage)
+        elif (resume and previous.get("version") == CHECKPOINT_VERSION and not previous.get("complete")
+              and now - previous.get("started_at", 0) < CHECKPOINT_TTL):
+            # only what the unfinished run itself completed; older
+            # checkpoints left by earlier, finished runs are stale
+            self.reuse = dict(previous.get("stages", {}))
+            started_at = previous["started_at"]
+            logging.info("Resuming the unfinished run from %s",
+                         time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(started_at)))
+        # a resumed run keeps the stages it inherits, so dying again does
+        # not lose them
+        self.manifest = {"version": CHECKPOINT_VERSION, "started_at": started_at,
+                         "complete": False, "stages": {k: v for k, v in self.reuse.items() if v}}
+        self._write_manifest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_json(self, name: str) -> dict | None:
+        try:
+            with open(self._path(name), encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _write_manifest(self) -> None:
+        _write_bytes(self._path("run.json"), _json_bytes(self.manifest))
+
+    def key(self, *parts: str) -> str:
+        """Input hash of a stage from upstream hashes and parameters."""
+        return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+    def run(self, stage: str, key: str, compute, dump=_json_bytes, load=json.loads, keep=None):
+        """
+        The result of `stage`: taken from its checkpoint when that may be
+        reused and was made from the same `key`, else compute() stored as
+        the new checkpoint. dump/load convert the result to and from bytes;
+        results for which keep(result) is false (a failed download) are
+        returned but not stored.
+        """
+        if self.directory is None:
+            return compute()
+
+        meta_name, data_name = f"{stage}.json", f"{stage}.data"
+        if stage in self.reuse:
+            meta = self._read_json(meta_name)
+            if (meta and meta.get("version") == CHECKPOINT_VERSION and meta.get("key") == key
+                    and self.reuse[stage] in (None, meta.get("hash"))):
+                try:
+                    with open(self._path(data_name), "rb") as fp:
+                        raw = fp.read()
+                except OSError:
+                    raw = None
+                if raw is not None and hashlib.sha1(raw).hexdigest() == meta.get("hash"):
+                    logging.info("✓ %s reused from checkpoint", stage)
+                    self._completed(stage, meta["hash"])
+                    return load(raw)
+
+        value = compute()
+        raw = dump(value)
+        digest = hashlib.sha1(raw).hexdigest()
+        if keep is None or keep(value):
+            # payload first: a meta file always describes a complete payload
+            _write_bytes(self._path(data_name), raw)
+            _write_bytes(self._path(meta_name), _json_bytes(
+                {"version": CHECKPOINT_VERSION, "stage": stage, "key": key,
+                 "hash": digest, "created_at": time.time()}))
+        self._completed(stage, digest)
+        return value
+
+    def _completed(self, stage: str, digest: str) -> None:
+        self.hashes[stage] = digest
+        if self.directory is not None:
+            self.manifest["stages"][stage] = digest
+            self._write_manifest()
+
+    def finish(self) -> None:
+        """Marks the run complete, so the next run starts afresh."""
+        if self.directory is not None:
+            self.manifest["complete"] = True
+            self._write_manifest()
+
+# ═════ incremental runs ════════════════════════════════════════════════════
+# The previous run's schedule snapshot and per-entry results are kept in
+# STATE_FILE. A run only validates channel ids whose stream result is
+# missing or older than the probe TTL, only matches channel names that are
+# new or older than NAME_TTL (logos and the EPG list are not downloaded at
+# all when nothing needs matching), and leaves the playlist untouched when
+# the rendered entries did not change.
+STATE_FILE    = "events_state.json"
+STATE_VERSION = 1
+NAME_TTL      = 12 * 3600
+
+def load_state(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as fp:
+            state = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) and state.get("version") == STATE_VERSION else {}
+
+def save_state(path: str, state: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(state, fp, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def schedule_snapshot(rows) -> dict[str, list[list[str]]]:
+    """event key → [[channel name, channel id], …]"""
+    snap: dict[str, list[list[str]]] = defaultdict(list)
+    for group, title, cname, cid in rows:
+        snap[f"{group}\x1f{title}"].append([cname, cid])
+    return dict(snap)
+
+def diff_schedule(old: dict, new: dict) -> tuple[set[str], set[str], set[str]]:
+    """(added, removed, changed) event keys."""
+    added   = new.keys() - old.keys()
+    removed = old.keys() - new.keys()
+    changed = {k for k in new.keys() & old.keys() if new[k] != old[k]}
+    return added, removed, changed
+
+def _playlist_digest(entries: list[m3u.Entry]) -> str:
+    h = hashlib.sha1(EPG_XML_URL.encode())
+    for entry in entries:
+        h.update("\n".join(entry.lines()).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+@metrics.timed()
+def update_playlist(schedule, state: dict, stream_db: str = streamstore.DB_FILE,
+                    probe_ttl: int = streamstore.DEFAULT_TTL, logo_mirror: str | None = None,
+                    now: float | None = None, checkpoints: Checkpoints | None = None) -> dict:
+    """
+    Brings OUTPUT_FILE up to date with `schedule`, reusing what `state`
+    (from load_state, or {} for a full rebuild) still covers. Stream,
+    logo, EPG and matching results go through `checkpoints`. Returns the
+    new state.
+    """
+    now  = time.time() if now is None else now
+    ckpt = checkpoints or Checkpoints(None)
+    rows = playlist_rows(schedule)
+    schedule_hash = ckpt.hashes.get("schedule") or hashlib.sha1(_json_bytes(schedule)).hexdigest()
+
+    snapshot = schedule_snapshot(rows)
+    added, removed, changed = diff_schedule(state.get("events", {}), snapshot)
+    logging.info("Schedule diff   +%d  -%d  ~%d events", len(added), len(removed), len(changed))
+
+    # streams: reuse fresh results, validate the rest
+    def validate():
+        ids     = {cid for *_, cid in rows}
+        reused  = {} if "streams" in ckpt.forced else state.get("streams", {})
+        checked = {cid: (url, at) for cid, (url, at) in reused.items()
+                   if cid in ids and now - at < probe_ttl}
+        todo = ids - checked.keys()
+        logging.info("Streams   %d reused  %d to validate", len(checked), len(todo))
+        if todo:
+            with streamstore.StreamStore(stream_db, probe_ttl) as store:
+                found = build_stream_map(todo, store=store)
+            checked.update((cid, (url, now)) for cid, url in found.items())
+        return checked
+
+    checked = ckpt.run("streams", ckpt.key(schedule_hash, str(probe_ttl)), validate)
+    streams = {cid: url for cid, (url, _) in checked.items()}
+
+    # names: reuse fresh matches, download logos/EPG only for new names
+    reused   = {} if "match" in ckpt.forced else state.get("names", {})
+    names    = {n: (m, l, at) for n, (m, l, at) in reused.items() if now - at < NAME_TTL}
+    resolved = {n: (m, l) for n, (m, l, _) in names.items()}
+    missing  = channel_names(rows, streams) - resolved.keys()
+    logging.info("Channel names   %d reused  %d to match", len(resolved), len(missing))
+    if missing:
+        logos = ckpt.run("logos", ckpt.key(logo_mirror or TVLOGO_API),
+                         lambda: build_logo_index(mirror=logo_mirror), keep=bool)
+
+        def download():
+            with requests.Session() as s:
+                s.hooks["response"].append(metrics.record_response)
+                return download_epg_lookup(s)
+
+        epg = ckpt.run("epg", ckpt.key(EPG_IDS_URL), download,
+                       dump=lambda lookup: bytes(lookup._buf), load=EpgLookup, keep=len)
+        # matches made without logos or EPG ids (a failed download) are
+        # used for this playlist only and retried on the next run
+        complete = bool(logos) and bool(len(epg))
+        inputs   = ckpt.key(ckpt.hashes.get("logos", ""), ckpt.hashes.get("epg", ""), *sorted(missing))
+        matched  = ckpt.run("match", inputs, lambda: resolve_channels(missing, logos, epg),
+                            keep=lambda _: complete)
+        resolved.update((n, tuple(v)) for n, v in matched.items())
+        if complete:
+            names.update((n, (*resolved[n], now)) for n in missing)
+        else:
+            logging.warning("Logo or EPG list missing, %d names will be matched again next run", len(missing))
+
+    entries = build_entries(rows, streams, resolved)
+
+    digest = _playlist_digest(entries)
+    if digest == state.get("playlist") and "output" not in ckpt.forced and os.path.exists(OUTPUT_FILE):
+        logging.info("Playlist unchanged, %s left as is", OUTPUT_FILE)
+    else:
+        write_playlist(entries)
+
+    return {
+        "version":  STATE_VERSION,
+        "built_at": now,
+        "events":   snapshot,
+        "streams":  checked,
+        "names":    names,
+        "playlist": digest,
+    }
 
 # ═════ download helpers ════════════════════════════════════════════════════
+@metrics.timed()
 def download_epg_lookup(sess: requests.Session):
+    try:
+        if time.time() - os.path.getmtime(EPG_LOOKUP_FILE) < EPG_LOOKUP_TTL:
+            lookup = EpgLookup.load(EPG_LOOKUP_FILE)
+            logging.info("✓ %d lookup keys from %s", len(lookup), EPG_LOOKUP_FILE)
+            return lookup
+    except (OSError, ValueError):
+        pass
+
     logging.info("Downloading EPG id list …")
     try:
         txt = sess.get(EPG_IDS_URL, timeout=30).text
     except Exception as e:
         logging.warning("EPG list download failed: %s", e)
-        return {}
+        return EpgLookup()
     lookup = build_epg_lookup(txt.splitlines())
+    try:
+        lookup.save(EPG_LOOKUP_FILE)
+    except OSError as e:
+        logging.warning("could not save %s: %s", EPG_LOOKUP_FILE, e)
     logging.info("✓ %d unique lookup keys", len(lookup))
     return lookup
 
+def _profile(args):
+    if not args.profile:
+        return contextlib.nullcontext({})
+    logging.info("Profiling (%s) into %s/", args.profile, args.profile_out)
+    return profiling.session(args.profile, args.profile_out, args.profile_interval)
+
 # ═════ main entry ══════════════════════════════════════════════════════════
 def main():
     ap = argparse.ArgumentParser(description="Build live playlist with robust EPG matching")
     ap.add_argument("-v", "--verbose", action="store_true")
+    ap.add_argument("--stream-db", default=streamstore.DB_FILE,
+                    help="SQLite file with the stream probe history")
+    ap.add_argument("--probe-ttl", type=int, default=streamstore.DEFAULT_TTL,
+                    help="seconds a probe result is reused before re-probing")
+    ap.add_argument("--state", default=STATE_FILE,
+                    help="snapshot of the previous run used for incremental updates")
+    ap.add_argument("--full", action="store_true",
+                    help="ignore the previous snapshot and rebuild everything")
+    ap.add_argument("--checkpoints", default=CHECKPOINT_DIR, metavar="DIR",
+                    help="stage results kept so an interrupted run resumes where it stopped")
+    ap.add_argument("--from-stage", choices=STAGES,
+                    help="re-run this stage and the ones after it on the checkpoints of the "
+                         "earlier stages, e.g. `--from-stage match` after changing the matching")
+    ap.add_argument("--logo-mirror", metavar="DIR",
+                    help="local tv-logos checkout used instead of the GitHub API")
+    ap.add_argument("--profile", nargs="?", const="cprofile", choices=profiling.MODES,
+                    help="profile the run per stage: cprofile (exact, slow) or sample "
+                         "(low overhead, safe for cron); default cprofile")
+    ap.add_argument("--profile-out", default="profile", metavar="DIR",
+                    help="directory for the pstats / collapsed-stack files and slowest calls")
+    ap.add_argument("--profile-interval", type=float, default=profiling.DEFAULT_INTERVAL,
+                    metavar="SECONDS", help="sampling interval of --profile sample")
     args = ap.parse_args()
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
                         format="%(levelname)s │ %(message)s")
 
-    schedule = get_schedule()
-    ids      = extract_channel_ids(schedule)
-    streams  = build_stream_map(ids)
-
-    with requests.Session() as s:
-        logos = build_logo_index(s)
-        epg   = download_epg_lookup(s)
+    # stage timings and per-host traffic go to metrics/events.{jsonl,prom}
+    with metrics.run("events"), _profile(args) as slowest:
+        state = {} if args.full else load_state(args.state)
+        ckpt  = Checkpoints(args.checkpoints, args.from_stage, resume=not args.full)
+        schedule = ckpt.run("schedule", "", get_schedule)
+        state = update_playlist(schedule, state, args.stream_db, args.probe_ttl, args.logo_mirror,
+                                checkpoints=ckpt)
+        save_state(args.state, state)
+        ckpt.finish()
 
-    make_playlist(schedule, streams, logos, epg)
+    for kind, calls in slowest.items():
+        logging.info("Slowest %s: %s", kind,
+                     ", ".join(f"{c['key']} {c['seconds'] * 1000:.1f}ms" for c in calls[:5]))
 
 if __name__ == "__main__":
     try:
@@ -1,10 +1,13 @@
 import os
 import re
 import sys
-import time
-import base64
 import requests
-from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import m3u
+import metrics
+import mirrors
+import streamstore
 
 CHANNELS_URL = 'https://josh9456-myproxy.hf.space/playlist/channels'
 PROXY_PREFIX = 'https://josh9456-myproxy.hf.space/watch/'
@@ -20,115 +23,89 @@ URL_TEMPLATES = [
 
 # 1. Download channels.m3u8
 
+@metrics.timed()
 def fetch_channels(dest='channels.m3u8'):
-    r = requests.get(CHANNELS_URL, timeout=10)
+    r = requests.get(CHANNELS_URL, timeout=10, hooks={'response': metrics.record_response})
     r.raise_for_status()
     with open(dest, 'wb') as f:
         f.write(r.content)
     print("✅ channels.m3u8 downloaded")
 
-# 2. Decode all base64 URLs from tivimate and validate their {num} links
-
-def validate_links(src='tivimate_playlist.m3u8', out='links.m3u8'):
-    decoded = []
-    with open(src) as f:
-        for line in f:
-            if line.strip().startswith(PROXY_PREFIX):
-                try:
-                    b64 = line.strip().split('/watch/')[1].split('.m3u8')[0]
-                    url = base64.b64decode(b64).decode().strip()
-                    decoded.append(url)
-                except:
-                    continue
-
-    ids = {m.group(1) for u in decoded if (m := PREMIUM.search(u))}
-    candidates = [t.format(num=i) for i in ids for t in URL_TEMPLATES]
-
-    def check(url):
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        for _ in range(3):
-            try:
-                r = requests.head(url, headers=headers, timeout=10)
-                if r.status_code == 200:
-                    return url
-                if r.status_code == 429:
-                    time.sleep(5)
-                if r.status_code == 404:
-                    return None
-                r = requests.get(url, headers=headers, timeout=10)
-                if r.status_code == 200:
-                    return url
-            except:
-                return None
-        return None
-
-    valid = []
-    with ThreadPoolExecutor(10) as pool:
-        for result in pool.map(check, candidates):
-            if result:
-                valid.append(result)
+# 2. Parse the tivimate playlist once; every proxy URL is decoded here
+
+@metrics.timed()
+def load_playlist(src='tivimate_playlist.m3u8'):
+    return list(m3u.parse(src))
+
+def proxied_target(entry):
+    if entry.url.startswith(PROXY_PREFIX):
+        return entry.target
+    return None
+
+def m3u_entries(items):
+    return (item for item in items if isinstance(item, m3u.Entry))
+
+# 3. Validate the {num} links of all decoded URLs
+
+@metrics.timed()
+def validate_links(items, out='links.m3u8', store=None, first_only=False):
+    ids = {m.group(1) for e in m3u_entries(items) if (t := proxied_target(e)) and (m := PREMIUM.search(t))}
+
+    own_store = store is None
+    if own_store:
+        store = streamstore.StreamStore()
+
+    # Mirrors confirmed within the store TTL are not probed again and the
+    # rest are tried best-host-first. Every mirror is probed by default:
+    # build_proxy_map matches channels.m3u8 targets by exact mirror URL and
+    # the playlist spreads them over all hosts. With first_only an id stops
+    # at its first working mirror instead.
+    try:
+        found = mirrors.race_all(sorted(ids), store, URL_TEMPLATES, {'User-Agent': 'Mozilla/5.0'},
+                                 first_only=first_only)
+    finally:
+        if own_store:
+            store.close()
+
+    valid = [url for num in sorted(ids) for url in found[num]]
 
     with open(out, 'w') as f:
         f.write('\n'.join(valid))
     print(f"✅ {len(valid)} validated URLs written to {out}")
+    return set(valid)
 
-# 3. Create a mapping from original stream → proxy link (no EXTINF)
-
-def build_proxy_map(channels='channels.m3u8', valid_file='links.m3u8'):
-    valid_links = set(open(valid_file).read().splitlines())
-    lines = open(channels).read().splitlines()
+# 4. Create a mapping from original stream → proxy link (no EXTINF)
 
+@metrics.timed()
+def build_proxy_map(valid_links, channels='channels.m3u8'):
     proxy_map = {}  # decoded original → proxy stream only
-    for i in range(len(lines) - 1):
-        if lines[i].startswith('#EXTINF'):
-            proxy = lines[i + 1].strip()
-            if '/watch/' in proxy:
-                try:
-                    b64 = proxy.split('/watch/')[1].split('.m3u8')[0]
-                    decoded = base64.b64decode(b64).decode().strip()
-                    if decoded in valid_links:
-                        proxy_map[decoded] = proxy
-                except:
-                    continue
+    for entry in m3u.entries(channels):
+        if entry.target and entry.target in valid_links:
+            proxy_map[entry.target] = entry.url
     print(f"✅ Proxy map built with {len(proxy_map)} entries")
     return proxy_map
 
-# 4. Replace only the stream lines, keep #EXTINF as-is
+# 5. Replace only the stream lines, keep #EXTINF as-is
 
-def rewrite_streams_only(src='tivimate_playlist.m3u8', proxy_map=None):
-    lines = open(src).read().splitlines()
-    out = []
-    i = 0
+@metrics.timed()
+def rewrite_streams_only(items, proxy_map, dest='tivimate_playlist.m3u8'):
     replaced = 0
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith('#EXTINF') and i + 1 < len(lines):
-            out.append(line)
-            stream_line = lines[i + 1].strip()
-            decoded = None
-            if stream_line.startswith(PROXY_PREFIX):
-                try:
-                    b64 = stream_line.split('/watch/')[1].split('.m3u8')[0]
-                    decoded = base64.b64decode(b64).decode().strip()
-                except:
-                    pass
-            if decoded and decoded in proxy_map:
-                out.append(proxy_map[decoded])
-                replaced += 1
-            else:
-                out.append(stream_line)
-            i += 2
-        else:
-            out.append(line)
-            i += 1
-
-    with open(src, 'w') as f:
-        f.write('\n'.join(out) + '\n')
+    with m3u.Writer(dest) as out:
+        for item in items:
+            if isinstance(item, m3u.Entry):
+                target = proxied_target(item)
+                if target and target in proxy_map:
+                    item.url = proxy_map[target]
+                    replaced += 1
+            out.write(item)
     print(f"✅ Updated {replaced} stream URLs with valid proxies")
 
 if __name__ == '__main__':
-    fetch_channels()
-    validate_links()
-    proxy_map = build_proxy_map()
-    rewrite_streams_only(proxy_map=proxy_map)
+    with metrics.run('all_channels'):
+        fetch_channels()
+        playlist = load_playlist()
+        with streamstore.StreamStore() as store:
+            valid = validate_links(playlist, store=store)
+        proxy_map = build_proxy_map(valid)
+        rewrite_streams_only(playlist, proxy_map)
     print("✅ Done.")
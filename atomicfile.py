@@ -0,0 +1,85 @@
+import gzip
+import io
+import os
+import tempfile
+
+# Atomic output files. Data is written to a temporary file next to the
+# destination and renamed over it on a clean close, so a job that dies
+# mid-run leaves the previous output in place instead of a partial file.
+
+BUFFER_SIZE = 1 << 16
+
+class AtomicFile:
+    """
+    File-like writer that replaces `path` only when closed without error.
+
+    Parameters:
+    path (str): Destination file.
+    binary (bool): Write bytes instead of text.
+    compress (bool): Gzip on the fly. Defaults to True for '.gz' paths.
+    encoding (str): Text encoding.
+
+        with AtomicFile('out.xml') as out:
+            out.write('...')
+    """
+    def __init__(self, path, binary=False, compress=None, encoding='utf-8'):
+        self.path = path
+        self.closed = False
+        if compress is None:
+            compress = path.endswith('.gz')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+        self.raw = os.fdopen(fd, 'wb', buffering=BUFFER_SIZE)
+        stream = self.raw
+        if compress:
+            # GzipFile leaves the temp file open on close(); self.raw is closed separately
+            stream = gzip.GzipFile(filename='', mode='wb', fileobj=self.raw, mtime=0)
+        self.file = stream if binary else io.TextIOWrapper(stream, encoding=encoding, newline='\n')
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def close(self):
+        """
+        Flushes the data and moves it into place.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.file.close()
+            self.raw.close()
+            os.chmod(self.tmp_path, 0o644)
+            os.replace(self.tmp_path, self.path)
+        except Exception:
+            self._remove()
+            raise
+
+    def discard(self):
+        """
+        Drops everything written so far; the destination is left untouched.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.file.close()
+            self.raw.close()
+        finally:
+            self._remove()
+
+    def _remove(self):
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
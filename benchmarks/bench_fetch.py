@@ -0,0 +1,44 @@
+"""
+Compares sequential bare requests.get against downloader.fetch_all on a
+local stand-in that adds a fixed latency per source.
+
+    python benchmarks/bench_fetch.py [sources] [delay]
+"""
+import os
+import sys
+import time
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import downloader
+from standin import Route, StandIn
+
+def main():
+    sources = int(sys.argv[1]) if len(sys.argv) > 1 else 38
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+    body = os.urandom(256 * 1024)
+
+    routes = {f'/epg_{i}.xml.gz': Route(body=body, delay=delay) for i in range(sources)}
+
+    with StandIn(routes) as srv:
+        urls = [srv.url(path) for path in routes]
+
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url)
+        sequential = time.perf_counter() - start
+
+        # one flaky source to exercise the retry path
+        routes['/epg_0.xml.gz'].statuses = [503]
+        session = downloader.create_session(backoff=0.1)
+        start = time.perf_counter()
+        results = downloader.fetch_all(urls, lambda url: downloader.get(url, session=session).content)
+        concurrent = time.perf_counter() - start
+
+    ok = sum(1 for r in results if r == body)
+    print(f"sources: {sources}  latency: {delay:.2f}s")
+    print(f"sequential requests.get : {sequential:6.2f}s")
+    print(f"downloader.fetch_all    : {concurrent:6.2f}s  ({ok}/{sources} ok, x{sequential / concurrent:.1f})")
+
+if __name__ == '__main__':
+    main()
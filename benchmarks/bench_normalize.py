@@ -0,0 +1,121 @@
+"""
+Benchmarks Events channel-name normalization on the real channel names.
+
+  legacy    the previous extract_channel_info / generate_brand_variations:
+            a COUNTRY_CODES scan with a re.sub per hit and chains of
+            `in` checks and replaces
+  compiled  events.extract_channel_info / generate_brand_variations on the
+            LabelScanner alternations compiled at import
+
+The corpus is every #EXTINF title of all_channels/tivimate_playlist.m3u8,
+the channel names of the Events schedule fixture (benchmarks/fixtures.py)
+and any extra playlists given on the command line. Both versions must give
+the same brand, country and set of variations for every name.
+
+    python benchmarks/bench_normalize.py [playlist.m3u8 ...] [--rounds N]
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Events'))
+import events
+import fixtures
+import m3u
+
+def legacy_extract_channel_info(name):
+    name = name.strip()
+    m = re.search(r'^(.*?)\s*\(([^)]+)\)$', name)
+    if m:
+        country = events.COUNTRY_CODES.get(m.group(2).lower(), 'unknown')
+        return m.group(1).strip(), country
+
+    parts = name.split()
+    for i in range(len(parts) - 1, 0, -1):
+        maybe = ' '.join(parts[i:]).lower()
+        if maybe in events.COUNTRY_CODES:
+            return ' '.join(parts[:i]).strip(), events.COUNTRY_CODES[maybe]
+    lower = name.lower()
+    for label, code in events.COUNTRY_CODES.items():
+        if label in lower:
+            brand = re.sub(rf'\b{re.escape(label)}\b', '', name, flags=re.I)
+            return brand.strip(), code
+    return name, 'unknown'
+
+def legacy_compress_long(slug):
+    res = {slug}
+    for ab, full in events.ABBR_MAP.items():
+        if full in slug:
+            res.add(slug.replace(full, ab))
+    return list(res)
+
+def legacy_generate_brand_variations(brand):
+    out = set()
+    b = brand.lower()
+
+    out.add(re.sub(r'\b(tv|hd|sd|channel|network|sports?|news)\b', '', b).strip())
+    num = {'one': '1', 'two': '2', 'three': '3', 'four': '4'}
+    for word, dig in num.items():
+        if word in b:
+            out.add(b.replace(word, dig))
+    if 'sports' in b:
+        out.add(b.replace('sports', 'sport'))
+    if 'sport' in b and 'sports' not in b:
+        out.add(b.replace('sport', 'sports'))
+
+    nets = {'espn': 'espn', 'fox sports': 'foxsports',
+            'sky sports': 'skysports', 'tnt sports': 'tntsports',
+            'bein sports': 'beinsports'}
+    for full, short in nets.items():
+        if full in b:
+            out.add(b.replace(full, short))
+
+    slug = b.replace(' ', '')
+    out |= set(legacy_compress_long(slug))
+    out.add(slug)
+    return [v for v in out if v]
+
+def corpus(playlists):
+    names = []
+    for path in playlists:
+        names += [entry.title for entry in m3u.entries(path)]
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(fixtures.prepare(tmp)['schedule.json'], encoding='utf-8') as file:
+            names += [cname for _, _, cname, _ in events.playlist_rows(json.load(file))]
+    return names
+
+def run(label, extract, variations, names, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = []
+        for name in names:
+            info = extract(name)
+            results.append((info, variations(info[0])))
+    elapsed = time.perf_counter() - start
+    print(f'{label:9} {len(names) * rounds / elapsed / 1e3:8.1f} k names/s')
+    return results
+
+def main():
+    args = sys.argv[1:]
+    rounds = 20
+    if '--rounds' in args:
+        i = args.index('--rounds')
+        rounds = int(args[i + 1])
+        del args[i:i + 2]
+
+    names = corpus([os.path.join(ROOT, 'all_channels', 'tivimate_playlist.m3u8')] + args)
+    print(f'{len(names)} names, {len(set(names))} distinct, {rounds} rounds')
+
+    old = run('legacy', legacy_extract_channel_info, legacy_generate_brand_variations, names, rounds)
+    new = run('compiled', events.extract_channel_info, events.generate_brand_variations, names, rounds)
+
+    differ = [name for name, (a, va), (b, vb) in zip(names, old, new) if a != b or set(va) != set(vb)]
+    print(f'names that normalize differently: {len(differ)}', *differ[:5], sep='\n  ')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmarks programme title rewriting on synthetic <programme> elements.
+
+  legacy  the previous hard-coded NHL/NFL check (find('title') and
+          find('sub-title') for every programme)
+  rules   rules.RuleSet compiled from epg-grabber/title-rules.json, alone
+          and with extra exact and regex rules loaded
+
+    python benchmarks/bench_rules.py [programmes]
+"""
+import json
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'epg-grabber'))
+import rules
+
+TITLES = ['NHL Hockey', 'Live: NFL Football', 'SportsCenter', 'NBA Basketball: Lakers at Celtics',
+          'The Late Show', 'Premier League Football', 'News at Ten', 'College Football']
+
+def legacy_rewrite(programme):
+    title = programme.find('title')
+    if title is None:
+        return False
+
+    title_text = title.text if title is not None else 'No title'
+
+    if title_text == 'NHL Hockey' or title_text == 'Live: NFL Football':
+        subtitle = programme.find('sub-title')
+        subtitle_text = subtitle.text if subtitle else 'No subtitle'
+        title.text = title_text + " " + subtitle_text
+
+    return True
+
+def make_programmes(count, seed=7):
+    random.seed(seed)
+    programmes = []
+    for i in range(count):
+        p = ET.Element('programme', start='20250101000000 +0000', stop='20250101010000 +0000', channel=f'c{i % 500}')
+        ET.SubElement(p, 'title').text = random.choice(TITLES)
+        if random.random() < 0.7:
+            ET.SubElement(p, 'sub-title').text = f'Episode {i}'
+        ET.SubElement(p, 'desc').text = 'Lorem ipsum dolor sit amet.'
+        ET.SubElement(p, 'category').text = random.choice(['Sports', 'News', 'Series'])
+        programmes.append(p)
+    return programmes
+
+def run(label, func, count):
+    programmes = make_programmes(count)
+    start = time.perf_counter()
+    kept = sum(1 for p in programmes if func(p))
+    elapsed = time.perf_counter() - start
+    print(f'{label:28} {count / elapsed / 1e6:6.2f} M programmes/s   kept {kept}')
+    return programmes
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+
+    with open(os.path.join(ROOT, 'epg-grabber', 'title-rules.json'), encoding='utf-8') as file:
+        shipped = json.load(file)
+    extra = [{'title': f'Show {i}', 'rewrite': '{title} ({category})'} for i in range(200)]
+    extra += [{'regex': rf'^League {i}\b', 'rewrite': '{title} - {sub-title}'} for i in range(50)]
+    extra += [{'regex': r'^NBA Basketball: (?P<away>\w+) at', 'rewrite': '{away}: {title} [{category}]'}]
+
+    ruleset = rules.RuleSet(shipped)
+    extended = rules.RuleSet(shipped + extra)
+
+    legacy = run('legacy', legacy_rewrite, count)
+    compiled = run(f'rules ({len(ruleset)} rules)', ruleset.apply, count)
+    run(f'rules ({len(extended)} rules)', extended.apply, count)
+
+    changed = sum(1 for a, b in zip(legacy, compiled) if a.find('title').text != b.find('title').text)
+    print(f'titles that differ from legacy: {changed} (legacy ignored existing sub-titles)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Checks and benchmarks daddyliveSchedule.findGames against the filter it
+replaced.
+
+  legacy   a scan of every game of the sport on every day with the
+           original `league in game["event"]` test
+  indexed  daddyliveSchedule.findGames on buildScheduleIndex
+
+The schedule is the Events fixture (benchmarks/fixtures.py) plus events
+whose league name is part of a longer word ("NFLPA Bowl", "NCAAB: Duke vs
+UNC", "WNBA Finals"). Every entry of daddyliveSchedule.LEAGUE_SPORTS and
+the extra leagues below must select the same games in the same order.
+
+    python benchmarks/bench_schedule.py [--rounds N]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import fixtures
+import daddyliveSchedule as daddy
+
+EXTRA_EVENTS = {
+    'Am. Football': ['NFLPA Bowl: American vs National', 'NCAA: Ohio State vs Michigan', 'NFL: Bills vs Jets'],
+    'Basketball': ['NCAAB: Duke vs UNC', 'WNBA Finals: Liberty vs Aces', 'NBA: Lakers at Celtics', 'NB: short'],
+    'Ice Hockey': ['NHL: Oilers vs Flames', 'KHL: SKA vs CSKA'],
+}
+EXTRA_LEAGUES = [{'league': 'NCAA', 'sport': 'Am. Football'}, {'league': 'NCAA', 'sport': 'Basketball'},
+                 {'league': 'NBA', 'sport': 'Basketball'}, {'league': 'NB', 'sport': 'Basketball'},
+                 {'league': 'HL', 'sport': 'Ice Hockey'}, {'league': 'Finals', 'sport': 'Basketball'}]
+
+def schedule():
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(fixtures.prepare(tmp)['schedule.json'], encoding='utf-8') as file:
+            dadjson = json.load(file)
+    for day in dadjson.values():
+        for sport, events in EXTRA_EVENTS.items():
+            day.setdefault(sport, []).extend({'time': '20:00', 'event': event, 'channels': []} for event in events)
+    return dadjson
+
+def legacy_find(dadjson, league, sport):
+    return [(dayPos, gamePos) for dayPos, day in enumerate(dadjson.values())
+            for gamePos, game in enumerate(day.get(sport, [])) if league in game['event']]
+
+def indexed_find(index, league, sport):
+    return [(dayPos, gamePos) for dayPos, gamePos, _, _ in daddy.findGames(index, league, sport)]
+
+def run(label, find, source, filters, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = [find(source, f['league'], f['sport']) for f in filters]
+    elapsed = time.perf_counter() - start
+    print(f'{label:8} {len(filters) * rounds / elapsed / 1e3:8.1f} k lookups/s')
+    return results
+
+def main():
+    args = sys.argv[1:]
+    rounds = int(args[args.index('--rounds') + 1]) if '--rounds' in args else 200
+
+    dadjson = schedule()
+    index = daddy.buildScheduleIndex(dadjson)
+    filters = daddy.LEAGUE_SPORTS + EXTRA_LEAGUES
+
+    old = run('legacy', legacy_find, dadjson, filters, rounds)
+    new = run('indexed', indexed_find, index, filters, rounds)
+
+    differ = [f"{f['league']}/{f['sport']}" for f, a, b in zip(filters, old, new) if a != b]
+    print(f'{sum(map(len, old))} games matched, filters that select differently: {len(differ)}', *differ, sep='\n  ')
+    sys.exit(1 if differ else 0)
+
+if __name__ == '__main__':
+    main()
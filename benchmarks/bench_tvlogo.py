@@ -0,0 +1,78 @@
+"""
+Benchmarks tvlogo payload extraction on saved GitHub tree pages.
+
+  scan  tvlogo.scan_payload_from_file: mmap + byte patterns for the two
+        nodes that are needed
+  soup  tvlogo.parse_payload_from_file: full BeautifulSoup parse
+
+Pages given on the command line are used as they are (e.g. the scraper's
+tvlogos.html); without arguments a synthetic page shaped like a GitHub
+directory view is generated.
+
+    python benchmarks/bench_tvlogo.py [page.html ...] [--items N]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tvlogo
+
+def synthetic_page(path, items, names=()):
+    names = list(names) + [f'channel-{i}-us.png' for i in range(items - len(names))]
+    tree = [{'name': name, 'path': f'countries/united-states/{name}', 'contentType': 'file'} for name in names]
+    data = {'payload': {'tree': {'items': tree, 'totalCount': len(tree)}, 'path': 'countries/united-states'}}
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<!DOCTYPE html><html><head><title>tv-logos</title></head><body>\n')
+        # GitHub pages carry a lot of markup around the two nodes we need
+        for name in names:
+            file.write(f'<div class="row"><a href="/tv-logo/tv-logos/blob/main/countries/united-states/'
+                       f'{name}" title="{name}">{name}</a>'
+                       f'<span class="age">3 days ago</span></div>\n')
+        file.write('<react-app app-name="react-code-view" '
+                   'initial-path="/tv-logo/tv-logos/tree/main/countries/united-states">\n')
+        file.write('<script type="application/json" data-target="react-app.embeddedData">')
+        file.write(json.dumps(data))
+        file.write('</script></react-app>\n</body></html>\n')
+
+def measure(func, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    args = sys.argv[1:]
+    items = 5000
+    if '--items' in args:
+        i = args.index('--items')
+        items = int(args[i + 1])
+        del args[i:i + 2]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = args
+        if not pages:
+            pages = [os.path.join(tmp, 'tree.html')]
+            synthetic_page(pages[0], items)
+
+        for page in pages:
+            size = os.path.getsize(page) / 1e6
+            scanned, scan_time, scan_peak = measure(tvlogo.scan_payload_from_file, page)
+            parsed, soup_time, soup_peak = measure(tvlogo.parse_payload_from_file, page)
+
+            print(f'{os.path.basename(page)}  {size:.1f} MB')
+            print(f'  scan  {scan_time * 1000:9.1f} ms  peak {scan_peak / 1e6:7.1f} MB')
+            print(f'  soup  {soup_time * 1000:9.1f} ms  peak {soup_peak / 1e6:7.1f} MB')
+            if scanned is None:
+                print('  scan  page shape not recognised, extract_payload_from_file falls back to soup')
+            else:
+                print(f'  same payload: {scanned == parsed}   speed-up x{soup_time / scan_time:.0f}')
+
+if __name__ == '__main__':
+    main()
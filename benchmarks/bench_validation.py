@@ -0,0 +1,91 @@
+"""
+Benchmarks stream validation against a local stand-in where one of the
+five mirrors rate-limits with 429 + Retry-After.
+
+  threads  the previous engine: ids x templates on a 30-thread pool with
+           requests.head and time.sleep(5) on 429
+  asyncio  mirrors.race_all: per-id racing, per-host token buckets, AIMD
+           windows and Retry-After pauses
+
+    python benchmarks/bench_validation.py [ids] [latency]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mirrors
+import streamstore
+from standin import Route, StandIn, Throttle
+
+MIRRORS = ['nfs', 'wind', 'zeko', 'dokko1', 'ddy6']
+
+def legacy_validate(url):
+    for _ in range(3):
+        try:
+            r = requests.head(url, timeout=10)
+            if r.status_code == 200:
+                return url
+            if r.status_code in (404, 410):
+                return None
+            if r.status_code == 429:
+                time.sleep(5)
+                continue
+        except requests.RequestException:
+            return None
+    return None
+
+def run_threads(ids, templates):
+    candidates = [t.format(num=i) for i in ids for t in templates]
+    with ThreadPoolExecutor(30) as pool:
+        results = list(pool.map(legacy_validate, candidates))
+    return {url.split('premium')[1].split('/')[0] for url in results if url}
+
+def run_asyncio(ids, templates):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = streamstore.StreamStore(os.path.join(tmp, 'probes.sqlite'))
+        found, engine = asyncio.run(mirrors._race_all(ids, store, templates, None, mirrors.TOP_K,
+                                                      mirrors.MAX_INFLIGHT, True))
+        store.close()
+    return {cid for cid, urls in found.items() if urls}, engine
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    ids = [str(i) for i in range(count)]
+
+    for name in ('threads', 'asyncio'):
+        # one server per mirror on its own loopback address, so each mirror is
+        # a separate host; the first one throttles
+        servers = [StandIn(address=f'127.0.0.{k + 2}') for k in range(len(MIRRORS))]
+        servers[0].throttles['/'] = Throttle(rate=20, retry_after=1)
+        for k, (mirror, srv) in enumerate(zip(MIRRORS, servers)):
+            srv.__enter__()
+            for i in ids:
+                ok = (int(i) + k) % 3 == 0
+                srv.routes[f'/{mirror}/premium{i}/mono.m3u8'] = Route(status=200 if ok else 404, delay=latency)
+        templates = [srv.url(f'/{m}/premium{{num}}/mono.m3u8') for m, srv in zip(MIRRORS, servers)]
+
+        start = time.perf_counter()
+        if name == 'threads':
+            working = run_threads(ids, templates)
+            extra = ''
+        else:
+            working, engine = run_asyncio(ids, templates)
+            throttled_host = streamstore.host_of(templates[0])
+            extra = f'  throttled-host window {engine.limiters[throttled_host].window:.1f}'
+        elapsed = time.perf_counter() - start
+
+        hits = sum(route.hits for srv in servers for route in srv.routes.values())
+        throttled = sum(t.rejected for srv in servers for t in srv.throttles.values())
+        for srv in servers:
+            srv.__exit__(None, None, None)
+        print(f'{name:8s} {elapsed:6.2f}s  {len(working)}/{count} ids  '
+              f'{hits + throttled} requests  {throttled} x 429{extra}')
+
+if __name__ == '__main__':
+    main()
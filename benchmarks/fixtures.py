@@ -0,0 +1,149 @@
+"""
+Fixtures for the offline benchmarks.
+
+Every fixture is looked up in benchmarks/fixtures/ first, where
+`python benchmarks/run.py --record` saves live copies. Missing fixtures are
+generated deterministically, and the checked-in epg.xml.gz and
+all_channels/tivimate_playlist.m3u8 are used as they are.
+
+    schedule.json       Events schedule (also fits daddyliveSchedule.py)
+    epg_ids.txt         ALL_SOURCES channel id list
+    tvlogos.html        GitHub tree page of tv-logos/countries/united-states
+    epg.xml.gz          gzipped XMLTV source
+    tivimate.m3u8       proxied playlist
+"""
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+RECORDED = os.path.join(HERE, 'fixtures')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Events'))
+
+BRANDS = [
+    ('Sky Sports Main Event', 'uk'), ('Sky Sports Premier League', 'uk'), ('Sky Sports F1', 'uk'),
+    ('TNT Sports 1', 'uk'), ('TNT Sports 2', 'uk'), ('BBC One', 'uk'), ('ITV1', 'uk'),
+    ('ESPN', 'us'), ('ESPN2', 'us'), ('FOX Sports 1', 'us'), ('NBC Sports', 'us'), ('CBS Sports Network', 'us'),
+    ('NFL Network', 'us'), ('NHL Network', 'us'), ('TSN1', 'ca'), ('Sportsnet One', 'ca'),
+    ('beIN Sports 1', 'fr'), ('Canal+ Sport', 'fr'), ('DAZN 1', 'de'), ('Sky Sport Bundesliga', 'de'),
+    ('Movistar LaLiga', 'es'), ('Sky Sport Uno', 'it'), ('Fox Sports 503', 'au'), ('SuperSport Premier League', 'za'),
+    ('Arena Sport 1', 'hr'), ('Sport TV1', 'pt'), ('Nova Sport', 'bg'), ('Astro SuperSport', 'my'),
+]
+COUNTRY_NAMES = {'uk': 'UK', 'us': 'USA', 'ca': 'Canada', 'fr': 'France', 'de': 'Germany', 'es': 'Spain',
+                 'it': 'Italy', 'au': 'Australia', 'za': 'South Africa', 'hr': 'Croatia', 'pt': 'Portugal',
+                 'bg': 'Bulgaria', 'my': 'Malaysia'}
+CATEGORIES = [('Soccer', 'EPL'), ('Ice Hockey', 'NHL'), ('Am. Football', 'NFL'), ('Basketball', 'NBA'),
+              ('Tennis', 'ATP'), ('Motorsport', 'F1')]
+
+def path(name):
+    """
+    Returns the recorded fixture `name` if there is one, else None.
+    """
+    candidate = os.path.join(RECORDED, name)
+    return candidate if os.path.isfile(candidate) else None
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read().splitlines()
+
+def _id_for(brand, cc):
+    return re.sub(r'[^A-Za-z0-9+]', '', brand.title()) + f'.{cc}'
+
+def make_schedule(target, days=3, events_per_category=60, seed=11):
+    random.seed(seed)
+    schedule = {}
+    for d in range(days):
+        day = f'{["Saturday", "Sunday", "Monday"][d % 3]} {18 + d}th Oct 2026 - Schedule Time UK GMT'
+        schedule[day] = {}
+        for category, league in CATEGORIES:
+            events = []
+            for i in range(events_per_category):
+                channels = []
+                for _ in range(random.randint(1, 4)):
+                    brand, cc = random.choice(BRANDS)
+                    style = random.random()
+                    if style < 0.4:
+                        name = f'{brand} {COUNTRY_NAMES[cc]}'
+                    elif style < 0.7:
+                        name = f'{brand} ({COUNTRY_NAMES[cc]})'
+                    else:
+                        name = brand
+                    channels.append({'channel_name': name, 'channel_id': str(random.randint(1, 900))})
+                events.append({'time': f'{random.randint(0, 23):02d}:{random.choice(["00", "30"])}',
+                               'event': f'{league}: Team {i} vs Team {i + 1}', 'channels': channels})
+            schedule[day][category] = events
+    with open(target, 'w', encoding='utf-8') as file:
+        json.dump(schedule, file)
+
+def make_epg_ids(target, epg_gz, extra=40000, seed=5):
+    random.seed(seed)
+    with gzip.open(epg_gz, 'rb') as file:
+        ids = [m.decode() for m in re.findall(rb'<channel id="([^"]+)"', file.read())]
+    for brand, cc in BRANDS:
+        ids += [_id_for(brand, cc), _id_for(brand, cc) + 'HD']
+    words = ['News', 'Movies', 'Kids', 'Music', 'Sport', 'Plus', 'Max', 'One', 'Two', 'Local', 'Classic', 'Life']
+    ccs = list(COUNTRY_NAMES)
+    for i in range(extra):
+        ids.append(f'{random.choice(words)}{random.choice(words)}{i % 97}.{random.choice(ccs)}')
+    random.shuffle(ids)
+    with open(target, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(ids) + '\n')
+
+def prepare(workdir):
+    """
+    Makes every fixture available in workdir and returns {name: path}.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    files = {}
+
+    files['epg.xml.gz'] = path('epg.xml.gz') or os.path.join(ROOT, 'epg.xml.gz')
+    files['tivimate.m3u8'] = path('tivimate.m3u8') or os.path.join(ROOT, 'all_channels', 'tivimate_playlist.m3u8')
+
+    files['schedule.json'] = path('schedule.json') or os.path.join(workdir, 'schedule.json')
+    if not os.path.isfile(files['schedule.json']):
+        make_schedule(files['schedule.json'])
+
+    files['epg_ids.txt'] = path('epg_ids.txt') or os.path.join(workdir, 'epg_ids.txt')
+    if not os.path.isfile(files['epg_ids.txt']):
+        make_epg_ids(files['epg_ids.txt'], files['epg.xml.gz'])
+
+    files['tvlogos.html'] = path('tvlogos.html') or os.path.join(workdir, 'tvlogos.html')
+    if not os.path.isfile(files['tvlogos.html']):
+        from bench_tvlogo import synthetic_page
+        import events
+        synthetic_page(files['tvlogos.html'], 3000, [f'{events.slugify(brand)}-{cc}.png' for brand, cc in BRANDS])
+
+    return files
+
+def record():
+    """
+    Saves live copies of the fixtures into benchmarks/fixtures/.
+    """
+    import downloader
+    import events
+
+    sources = {
+        'schedule.json': (events.SCHEDULE_URL, events.HEADERS),
+        'epg_ids.txt': (events.EPG_IDS_URL, None),
+        'tvlogos.html': ('https://github.com/tv-logo/tv-logos/tree/main/countries/united-states', None),
+        'epg.xml.gz': ('https://epgshare01.online/epgshare01/epg_ripper_UK1.xml.gz', None),
+    }
+    os.makedirs(RECORDED, exist_ok=True)
+    for name, (url, headers) in sources.items():
+        try:
+            response = downloader.get(url, headers=headers, stream=True)
+            response.raise_for_status()
+            # undo the Content-Encoding (requests asks for gzip), keep the body itself
+            response.raw.decode_content = True
+            with open(os.path.join(RECORDED, name), 'wb') as file:
+                shutil.copyfileobj(response.raw, file)
+            print(f'recorded {name} from {url}')
+        except Exception as e:
+            print(f'could not record {name}: {e}')
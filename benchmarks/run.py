@@ -0,0 +1,301 @@
+"""
+Offline benchmark of every pipeline stage on recorded fixtures.
+
+Each stage runs in a fresh process, so its peak RSS is its own, and talks
+only to local stand-in servers (see standin.py); nothing reaches the real
+endpoints. Fixtures come from benchmarks/fixtures/ when recorded with
+--record, otherwise they are generated (see fixtures.py).
+
+  fetch           httpcache downloads of gzipped XMLTV sources
+  epg_parse       getEpgs.filter_source on epg.xml.gz
+  epg_write       epgstore ingest + export of the guide
+  lookup_build    events.build_epg_lookup on the ALL_SOURCES id list
+  matching        events.find_best_epg_match for every schedule channel name
+  logos           tvlogo payload scan + LogoSearchIndex searches
+  validation      mirrors.race_all over five stand-in mirrors
+  playlist_parse  m3u.parse of the tivimate playlist
+  playlist_write  events.resolve_channels + build_entries + write_playlist
+  schedule_write  daddyliveSchedule playlist + XMLTV for NHL/NFL games
+
+    python benchmarks/run.py [stage ...] [--repeat N] [--json out.json]
+                             [--baseline old.json] [--record]
+
+With --baseline the change against an earlier --json run is printed next
+to every stage.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Events'))
+sys.path.insert(0, os.path.join(ROOT, 'epg-grabber'))
+import fixtures
+
+FETCH_SOURCES = 12
+FETCH_LATENCY = 0.05
+MIRRORS = ['nfs', 'wind', 'zeko', 'dokko1', 'ddy6']
+MIRROR_LATENCY = 0.01
+
+def _schedule(files):
+    with open(files['schedule.json'], encoding='utf-8') as file:
+        return json.load(file)
+
+def _lookup(files):
+    import events
+    with open(files['epg_ids.txt'], encoding='utf-8') as file:
+        return events.build_epg_lookup(file.read().splitlines())
+
+def _logos(files):
+    import events
+    import tvlogo
+    payload = tvlogo.extract_payload_from_file(files['tvlogos.html'])
+    logos = {}
+    for item in payload['tree']['items']:
+        events._add_logo(logos, 'united-states', item['name'])
+    return logos
+
+def _channel_names(schedule):
+    import events
+    return sorted({cname for _, _, cname, _ in events.playlist_rows(schedule)})
+
+# ═════ stages ══════════════════════════════════════════════════════════════
+# Each stage gets the fixture paths, an empty scratch directory and an
+# ExitStack for servers and stores to close afterwards, does its setup, then
+# returns (timed callable, unit). The callable returns the item
+# count. Setup is repeated for every run, so caches and probe history never
+# carry over between runs.
+
+def stage_fetch(files, tmp, stack):
+    import downloader
+    import httpcache
+    from standin import Route, StandIn
+
+    with open(files['epg.xml.gz'], 'rb') as file:
+        body = file.read()
+    routes = {f'/epg_ripper_{i}.xml.gz': Route(body=body, delay=FETCH_LATENCY, etag=f'"{i}"')
+              for i in range(FETCH_SOURCES)}
+    srv = stack.enter_context(StandIn(routes))
+    urls = [srv.url(path) for path in routes]
+    cache = httpcache.HTTPCache(os.path.join(tmp, 'cache'))
+
+    def run():
+        results = downloader.fetch_all(urls, cache.fetch)
+        return sum(os.path.getsize(r.path) for r in results if r) / 1e6
+    return run, 'MB'
+
+def stage_epg_parse(files, tmp, stack):
+    import getEpgs
+    ids = set(fixtures.read_lines(files['epg_ids.txt']))
+
+    def run():
+        return len(getEpgs.filter_source(files['epg.xml.gz'], files['epg.xml.gz'], ids))
+    return run, 'elements'
+
+def stage_epg_write(files, tmp, stack):
+    import getEpgs
+    import epgstore
+    from atomicfile import AtomicFile
+    ids = set(fixtures.read_lines(files['epg_ids.txt']))
+    records = getEpgs.filter_source(files['epg.xml.gz'], files['epg.xml.gz'], ids)
+    starts = [epgstore.parse_xmltv_time(r[2]) for r in records if r[0] == 'programme']
+    now = min(starts) if starts else None
+    store = stack.enter_context(epgstore.EpgStore(os.path.join(tmp, 'store.sqlite'), 10 ** 9, 10 ** 9))
+
+    def run():
+        store.replace_source('fixture', 0, 'sig', records, now)
+        with AtomicFile(os.path.join(tmp, 'epg.xml'), binary=True) as xml, \
+                AtomicFile(os.path.join(tmp, 'epg.xml.gz'), binary=True) as gz:
+            channels, programmes = store.export([xml, gz], now=now)
+        return channels + programmes
+    return run, 'elements'
+
+def stage_lookup_build(files, tmp, stack):
+    import events
+    lines = fixtures.read_lines(files['epg_ids.txt'])
+
+    def run():
+        events.build_epg_lookup(lines)
+        return len(lines)
+    return run, 'ids'
+
+def stage_matching(files, tmp, stack):
+    import events
+    lookup = _lookup(files)
+    names = _channel_names(_schedule(files))
+
+    def run():
+        for name in names:
+            events.find_best_epg_match(name, lookup)
+        return len(names)
+    return run, 'names'
+
+def stage_logos(files, tmp, stack):
+    import tvlogo
+    names = _channel_names(_schedule(files))
+
+    def run():
+        payload = tvlogo.extract_payload_from_file(files['tvlogos.html'])
+        index = tvlogo.LogoSearchIndex.from_payload(payload)
+        for name in names:
+            index.search(name.lower(), limit=1)
+        return len(names)
+    return run, 'names'
+
+def stage_validation(files, tmp, stack):
+    import events
+    import mirrors
+    import streamstore
+    from standin import Route, StandIn
+
+    ids = sorted(events.extract_channel_ids(_schedule(files)))
+    servers = [stack.enter_context(StandIn(address=f'127.0.0.{k + 2}')) for k in range(len(MIRRORS))]
+    for k, (mirror, srv) in enumerate(zip(MIRRORS, servers)):
+        for n, cid in enumerate(ids):
+            ok = (n + k) % 3 == 0
+            srv.routes[f'/{mirror}/premium{cid}/mono.m3u8'] = Route(status=200 if ok else 404, delay=MIRROR_LATENCY)
+    templates = [srv.url(f'/{m}/premium{{num}}/mono.m3u8') for m, srv in zip(MIRRORS, servers)]
+    store = stack.enter_context(streamstore.StreamStore(os.path.join(tmp, 'probes.sqlite')))
+
+    def run():
+        mirrors.race_all(ids, store, templates)
+        return len(ids)
+    return run, 'ids'
+
+def stage_playlist_parse(files, tmp, stack):
+    import m3u
+
+    def run():
+        return sum(1 for item in m3u.parse(files['tivimate.m3u8']) if isinstance(item, m3u.Entry))
+    return run, 'entries'
+
+def stage_playlist_write(files, tmp, stack):
+    import events
+    schedule = _schedule(files)
+    lookup = _lookup(files)
+    logos = _logos(files)
+    streams = {cid: f'https://mirror.invalid/premium{cid}/mono.m3u8' for cid in events.extract_channel_ids(schedule)}
+    path = os.path.join(tmp, 'schedule_playlist.m3u8')
+
+    def run():
+        rows = events.playlist_rows(schedule)
+        resolved = events.resolve_channels(events.channel_names(rows, streams), logos, lookup)
+        entries = events.build_entries(rows, streams, resolved)
+        events.write_playlist(entries, path)
+        return len(entries)
+    return run, 'entries'
+
+def stage_schedule_write(files, tmp, stack):
+    import m3u
+    import xmltv
+    import daddyliveSchedule as daddy
+    schedule = _schedule(files)
+    index = daddy.buildScheduleIndex(schedule)
+    filters = [{'league': 'NHL', 'sport': 'Ice Hockey'}, {'league': 'NFL', 'sport': 'Am. Football'}]
+    needed = sum(len(game.get('channels', [])) for games in index.values() for *_, game in games)
+
+    def run():
+        daddy.unique_ids = daddy.generate_unique_ids(needed)
+        daddy.channelCount = 0
+        with m3u.Writer(os.path.join(tmp, 'daily.m3u8'), spacer=True) as playlist, \
+                xmltv.Writer(os.path.join(tmp, 'daily.xml')) as guide:
+            daddy.addChannelsByLeagueSport(daddy.buildScheduleIndex(schedule), filters, playlist, guide)
+        return playlist.count
+    return run, 'entries'
+
+STAGES = {
+    'fetch':          stage_fetch,
+    'epg_parse':      stage_epg_parse,
+    'epg_write':      stage_epg_write,
+    'lookup_build':   stage_lookup_build,
+    'matching':       stage_matching,
+    'logos':          stage_logos,
+    'validation':     stage_validation,
+    'playlist_parse': stage_playlist_parse,
+    'playlist_write': stage_playlist_write,
+    'schedule_write': stage_schedule_write,
+}
+
+# ═════ runner ══════════════════════════════════════════════════════════════
+
+def _run_stage(name, files, repeat, queue):
+    # daddyliveSchedule prints every game; keep the report readable
+    sys.stdout = open(os.devnull, 'w')
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as stack:
+            run, unit = STAGES[name](files, tmp, stack)
+            start = time.perf_counter()
+            items = run()
+            times.append(time.perf_counter() - start)
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    queue.put({'seconds': min(times), 'items': items, 'unit': unit, 'peak_rss': peak})
+
+def run_stage(name, files, repeat=1):
+    """
+    Runs one stage in a new process. Returns its result dict.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    proc = context.Process(target=_run_stage, args=(name, files, repeat, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {'error': f'exit code {proc.exitcode}'}
+    return queue.get()
+
+def _delta(now, before):
+    if not before or not before.get('seconds'):
+        return ''
+    return f'  {(now - before["seconds"]) / before["seconds"] * 100:+6.1f}%'
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the pipeline stages offline')
+    ap.add_argument('stages', nargs='*', metavar='stage',
+                    help=f'stages to run (default: all): {", ".join(STAGES)}')
+    ap.add_argument('--repeat', type=int, default=3, help='runs per stage, the fastest is reported')
+    ap.add_argument('--json', metavar='FILE', help='write the results as JSON')
+    ap.add_argument('--baseline', metavar='FILE', help='earlier --json results to compare with')
+    ap.add_argument('--record', action='store_true', help='save live fixtures to benchmarks/fixtures/ and exit')
+    args = ap.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        ap.error(f'unknown stage: {", ".join(unknown)}')
+
+    if args.record:
+        fixtures.record()
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        files = fixtures.prepare(tmp)
+        print(f'{"stage":16} {"time":>9} {"throughput":>22} {"peak RSS":>10}')
+        for name in args.stages or STAGES:
+            result = results[name] = run_stage(name, files, args.repeat)
+            if 'error' in result:
+                print(f'{name:16} failed ({result["error"]})')
+                continue
+            rate = result['items'] / result['seconds'] if result['seconds'] else 0
+            print(f'{name:16} {result["seconds"] * 1000:7.1f}ms {rate:12.0f} {result["unit"] + "/s":9} '
+                  f'{result["peak_rss"] / 1e6:7.1f} MB{_delta(result["seconds"], baseline.get(name))}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
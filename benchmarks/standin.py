@@ -0,0 +1,139 @@
+"""
+Local HTTP stand-in server for exercising the fetch code offline.
+
+Routes are registered as path -> Route and served by a threaded server on
+127.0.0.1 with a random port:
+
+    with StandIn({'/a.xml.gz': Route(body=data, delay=0.2)}) as srv:
+        downloader.get(srv.url('/a.xml.gz'))
+
+Throttle(rate) entries keyed by path prefix answer 429 with Retry-After
+once more than `rate` requests per second hit that prefix, simulating a
+mirror that rate-limits.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Route:
+    """
+    A canned response. `statuses` is consumed one per request before
+    falling back to `status`, which makes retry paths easy to simulate.
+    """
+    def __init__(self, body=b'', status=200, delay=0.0, headers=None, statuses=None, etag=None):
+        self.body = body
+        self.status = status
+        self.delay = delay
+        self.headers = headers or {}
+        self.statuses = list(statuses or [])
+        self.etag = etag
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def next_status(self):
+        with self.lock:
+            self.hits += 1
+            return self.statuses.pop(0) if self.statuses else self.status
+
+class Throttle:
+    """
+    Allows `rate` requests per second (with a burst of the same size) for a
+    path prefix and answers the excess with 429 + Retry-After.
+    """
+    def __init__(self, rate, retry_after=1):
+        self.rate = rate
+        self.retry_after = retry_after
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.rejected += 1
+            return False
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _serve(self, send_body):
+        for prefix, throttle in self.server.throttles.items():
+            if self.path.startswith(prefix) and not throttle.allow():
+                self._reply(429, {'Retry-After': str(throttle.retry_after)})
+                return
+
+        route = self.server.routes.get(self.path)
+        if route is None:
+            self._reply(404)
+            return
+
+        status = route.next_status()
+        if route.delay:
+            time.sleep(route.delay)
+
+        if status == 200 and route.etag and self.headers.get('If-None-Match') == route.etag:
+            status = 304
+
+        body = route.body if status == 200 else b''
+        self.send_response(status)
+        for key, value in route.headers.items():
+            self.send_header(key, value)
+        if route.etag:
+            self.send_header('ETag', route.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._serve(True)
+
+    def do_HEAD(self):
+        self._serve(False)
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+class StandIn:
+    def __init__(self, routes=None, throttles=None, address='127.0.0.1'):
+        self.server = _Server((address, 0), _Handler)
+        self.server.routes = dict(routes or {})
+        self.server.throttles = dict(throttles or {})
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def routes(self):
+        return self.server.routes
+
+    @property
+    def throttles(self):
+        return self.server.throttles
+
+    def url(self, path):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}{path}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
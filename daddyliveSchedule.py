@@ -1,10 +1,12 @@
-import xml.etree.ElementTree as ET
 import random
 import uuid
 import fetcher
+import m3u
+import metrics
+import xmltv
 import json
-import os
 import datetime
+import functools
 import pytz
 
 #generate static list of static channel names
@@ -18,6 +20,11 @@ DADDY_JSON_FILE     = "daddyliveSchedule.json"
 M3U8_OUTPUT_FILE    = "daily.m3u8"
 EPG_OUTPUT_FILE     = "daily.xml"
 LOGO                = "https://raw.githubusercontent.com/JHarding86/daddylive-m3u/refs/heads/main/hardingtv.png"
+GROUP_TITLE         = "USA (DADDY LIVE)"
+DATE_FORMAT         = "%A %d %b %Y %H:%M - Schedule Time UK GMT"
+LEAGUE_SPORTS       = [{"league":"NHL", "sport":"Ice Hockey"},
+                       {"league":"NFL", "sport":"Am. Football"}]
+GRAM_SIZE           = 3
 
 mStartTime = 0
 mStopTime = 0
@@ -40,134 +47,159 @@ def loadJSON(filepath):
 
     return json_object
 
-def createSingleChannelEPGData(UniqueID, tvgName):
-     #Creating M3U8 Data
-    xmlChannel      = ET.Element('channel')
-    xmlDisplayName  = ET.Element('display-name')
-    xmlIcon         = ET.Element('icon')
-
-    xmlChannel.set('id', UniqueID)
-    xmlDisplayName.text = tvgName
-    xmlIcon.set('src', LOGO)
-
-    xmlChannel.append(xmlDisplayName)
-    xmlChannel.append(xmlIcon)
+def cleanScheduleDay(day):
+    """
+    Turns a schedule day key like 'Saturday 18th Oct 2025 - Schedule Time UK GMT'
+    into a strptime-able prefix; the game time is inserted before the '-'.
+    """
+    return day.replace("th ", " ").replace("rd ", " ").replace("st ", " ").replace("nd ", " ").replace("Dec Dec", "Dec")
+
+@functools.lru_cache(maxsize=None)
+def parseGameTime(cleanDay, gameTime):
+    """
+    Parses one (day, game time) pair. Every game sharing a kick-off time on
+    a day reuses the cached result.
+
+    Returns:
+    tuple: (EPG start, EPG stop, display label such as '10/18/25 - 12:00 PM (MST)')
+    """
+    start_date = datetime.datetime.strptime(cleanDay.replace("-", gameTime + " -"), DATE_FORMAT)
+    startTime = start_date.strftime("%Y%m%d000000")
+    stopTime = (start_date + datetime.timedelta(days=2)).strftime("%Y%m%d000000")
+    startHour = (start_date - datetime.timedelta(hours=7)).strftime("%I:%M %p") + " (MST)"
+    return startTime, stopTime, start_date.strftime("%m/%d/%y") + " - " + startHour
+
+def eventGrams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+@metrics.timed()
+def buildScheduleIndex(dadjson):
+    """
+    Indexes every game of the schedule once by (sport, 3-character substring
+    of the event name). (sport, None) lists all games of a sport.
+
+    Parameters:
+    dadjson (dict): The daddylive schedule.
+
+    Returns:
+    dict: {(sport, gram): [(dayPos, gamePos, cleanDay, game), ...]} in schedule order.
+    """
+    index = {}
+    for dayPos, (day, sports) in enumerate(dadjson.items()):
+        if not isinstance(sports, dict):
+            continue
+        cleanDay = cleanScheduleDay(day)
+        for sport, games in sports.items():
+            if not isinstance(games, list):
+                continue
+            for gamePos, game in enumerate(games):
+                if not isinstance(game, dict) or not isinstance(game.get("event"), str):
+                    continue
+                entry = (dayPos, gamePos, cleanDay, game)
+                index.setdefault((sport, None), []).append(entry)
+                for gram in eventGrams(game["event"]):
+                    index.setdefault((sport, gram), []).append(entry)
+    return index
+
+def findGames(index, league, sport):
+    """
+    Returns the indexed games of `sport` whose event name contains `league`,
+    the same substring test (`league in event`) the filter always used.
+
+    Every event containing the league contains each of its 3-character
+    substrings, so the rarest one's posting list holds all the matches and
+    only those candidates are tested. Leagues shorter than that are tested
+    against all games of the sport.
+    """
+    postings = [index.get((sport, gram), []) for gram in eventGrams(league)]
+    candidates = min(postings, key=len) if postings else index.get((sport, None), [])
+    return [entry for entry in candidates if league in entry[3]["event"]]
+
+@metrics.timed()
+def addChannelsByLeagueSport(scheduleIndex, leagueSportTuple, playlist, guide):
+    """
+    Adds a playlist entry and a guide programme for every channel of every
+    game that matches one of the (league, sport) filters.
+
+    Parameters:
+    scheduleIndex (dict): Built by buildScheduleIndex().
+    leagueSportTuple (list): [{"league": ..., "sport": ...}, ...]
+    playlist (m3u.Writer): Receives the stream entries.
+    guide (xmltv.Writer): Receives the channels and programmes.
+    """
+    global mStartTime, mStopTime, channelCount
+
+    # Same order as walking the schedule: day, then filter, then game
+    matches = []
+    for filterPos, leagueSport in enumerate(leagueSportTuple):
+        for dayPos, gamePos, cleanDay, game in findGames(scheduleIndex, leagueSport["league"], leagueSport["sport"]):
+            matches.append((dayPos, filterPos, gamePos, cleanDay, game))
+    matches.sort(key=lambda match: match[:3])
+
+    for _, _, _, cleanDay, game in matches:
+        print(game["event"])
+        try:
+            startTime, stopTime, format_12_hour = parseGameTime(cleanDay, game["time"])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Could not parse the time of {game['event']}: {e}")
+            continue
 
-    return xmlChannel
+        for channel in game.get("channels", []):
+            mStartTime, mStopTime = startTime, stopTime
 
-def createSingleEPGData(startTime, stopTime, UniqueID, channelName, description):
-    #Creating EPG Data
-    programme   = ET.Element('programme')
-    title       = ET.Element('title')
-    desc        = ET.Element('desc')
+            UniqueID    = unique_ids.pop(0)
+            try:
+                channelName = game["event"] + " " + format_12_hour + " " + channel["channel_name"]
+            except TypeError:
+                print("Ill formatted JSON, skipping this channel for this game.")
+                continue
 
-    programme.set('start', startTime + " +0000")
-    programme.set('stop', stopTime + " +0000")
-    programme.set('channel', UniqueID)
+            channelID   = f"{channel['channel_id']}"
 
-    title.text = channelName
+            tvgName = "OpenChannel" + str(channelCount).zfill(3)
+            tvLabel = tvgName
+            channelCount = channelCount + 1
 
-    desc.text = description
+            # tvgName = channelName
+            # tvLabel = channel["channel_name"]
 
-    programme.append(title)
-    programme.append(desc)
+            playlist.add({"tvg-id": UniqueID, "tvg-name": tvgName, "tvg-logo": LOGO, "group-title": GROUP_TITLE},
+                         tvLabel, f"https://xyzdddd.mizhls.ru/lb/premium{channelID}/index.m3u8")
 
-    return programme
-
-def addChannelsByLeagueSport(leagueSportTuple):
-    for day, value in dadjson.items():
-        try:
-            # print("NEW DAY\n\n\n")
-            for leagueSport in leageSportTuple:
-                sport = dadjson[f"{day}"][leagueSport["sport"]]
-                for game in sport:
-                    if leagueSport["league"] in game["event"]:
-                        print(game["event"])
-                    
-                        for channel in game["channels"]:
-                            #Creating Time Data
-                            date_time = day.replace("th ", " ").replace("rd ", " ").replace("st ", " ").replace("nd ", " ").replace("Dec Dec", "Dec")
-                            date_time = date_time.replace("-", game["time"] + " -")
-                            # Parse the cleaned date string into a datetime object
-                            date_format = "%A %d %b %Y %H:%M - Schedule Time UK GMT"
-                            start_date = datetime.datetime.strptime(date_time, date_format)
-                            global mStartTime
-                            mStartTime = start_date.strftime("%Y%m%d000000")
-                            stop_date = start_date + datetime.timedelta(days=2)
-                            global mStopTime
-                            mStopTime = stop_date.strftime("%Y%m%d000000")
-                            
-                            format_12_hour = start_date.strftime("%m/%d/%y")
-                            start_date = start_date - datetime.timedelta(hours=7)
-
-                            startHour = start_date.strftime("%I:%M %p") + " (MST)"
-                            format_12_hour = format_12_hour + " - " + startHour
-
-                            UniqueID    = unique_ids.pop(0)
-                            try:
-                                channelName = game["event"] + " " + format_12_hour + " " + channel["channel_name"]
-                            except TypeError:
-                                print("Ill formatted JSON, skipping this channel for this game.")
-                                continue
-                            
-                            channelID   = f"{channel['channel_id']}"
-
-                            global channelCount
-                            tvgName = "OpenChannel" + str(channelCount).zfill(3)
-                            tvLabel = tvgName
-                            channelCount = channelCount + 1
-
-                            # tvgName = channelName
-                            # tvLabel = channel["channel_name"]
-
-                            with open(M3U8_OUTPUT_FILE, 'a', encoding='utf-8') as file:  # Use 'a' mode for appending
-                                file.write(f'#EXTINF:-1 tvg-id="{UniqueID}" tvg-name="{tvgName}" tvg-logo="{LOGO}" group-title="USA (DADDY LIVE)", {tvLabel}\n')
-                                file.write(f"https://xyzdddd.mizhls.ru/lb/premium{channelID}/index.m3u8\n")
-                                file.write('\n')
-
-                            #Creating M3U8 Data
-                            xmlChannel = createSingleChannelEPGData(UniqueID, tvgName)
-                            root.append(xmlChannel)
-
-                            programme = createSingleEPGData(mStartTime, mStopTime, UniqueID, channelName, "No Description")
-                            root.append(programme)
-        except KeyError as e:
-            print(f"KeyError: {e} - One of the keys {day} or {leagueSportTuple} does not exist.")
+            #Creating EPG Data
+            guide.channel(UniqueID, tvgName, icon=LOGO)
+            guide.programme(mStartTime + " +0000", mStopTime + " +0000", UniqueID, channelName, "No Description")
 
 channelCount = 0
 unique_ids = generate_unique_ids(NUM_CHANNELS)
 
-fetcher.fetchHTML(DADDY_JSON_FILE, "https://thedaddy.to/schedule/schedule-generated.json")
-
-dadjson = loadJSON(DADDY_JSON_FILE)
-
-if os.path.isfile(M3U8_OUTPUT_FILE):
-    os.remove(M3U8_OUTPUT_FILE)
+def main():
+    global channelCount
 
-root = ET.Element('tv')
+    fetcher.fetchHTML(DADDY_JSON_FILE, "https://thedaddy.to/schedule/schedule-generated.json")
 
-#league sport tuple
-leageSportTuple = []
-leageSportTuple.append({"league":"NHL", "sport":"Ice Hockey"})
-leageSportTuple.append({"league":"NFL", "sport":"Am. Football"})
+    dadjson = loadJSON(DADDY_JSON_FILE)
+    scheduleIndex = buildScheduleIndex(dadjson)
 
-addChannelsByLeagueSport(leageSportTuple)
+    #league sport tuple
+    leageSportTuple = LEAGUE_SPORTS
 
-#Fill out the remaining channels so that you don't have to re-add the channels list into plex
-for id in unique_ids:
-    with open(M3U8_OUTPUT_FILE, 'a', encoding='utf-8') as file:  # Use 'a' mode for appending
-        channelNumber = str(channelCount).zfill(3)
-        tvgName = "OpenChannel" + channelNumber
-        file.write(f'#EXTINF:-1 tvg-id="{id}" tvg-name="{tvgName}" tvg-logo="{LOGO}" group-title="USA (DADDY LIVE)", {tvgName}\n')
-        file.write(f"https://xyzdddd.mizhls.ru/lb/premium{channelNumber}/index.m3u8\n")
-        file.write('\n')
-        channelCount += 1
+    # Both files are streamed to temp files and only replace daily.m3u8 /
+    # daily.xml once complete; a '.gz' EPG_OUTPUT_FILE is gzipped on the fly.
+    with m3u.Writer(M3U8_OUTPUT_FILE, spacer=True) as playlist, xmltv.Writer(EPG_OUTPUT_FILE) as guide:
+        addChannelsByLeagueSport(scheduleIndex, leageSportTuple, playlist, guide)
 
-    xmlChannel = createSingleChannelEPGData(id, tvgName)
-    root.append(xmlChannel)
+        #Fill out the remaining channels so that you don't have to re-add the channels list into plex
+        for id in unique_ids:
+            channelNumber = str(channelCount).zfill(3)
+            tvgName = "OpenChannel" + channelNumber
+            playlist.add({"tvg-id": id, "tvg-name": tvgName, "tvg-logo": LOGO, "group-title": GROUP_TITLE},
+                         tvgName, f"https://xyzdddd.mizhls.ru/lb/premium{channelNumber}/index.m3u8")
+            channelCount += 1
 
-    programme = createSingleEPGData(mStartTime, mStopTime, id, "No Programm Available", "No Description")
-    root.append(programme)
+            guide.channel(id, tvgName, icon=LOGO)
+            guide.programme(mStartTime + " +0000", mStopTime + " +0000", id, "No Programm Available", "No Description")
 
-tree = ET.ElementTree(root)
-tree.write(EPG_OUTPUT_FILE, encoding='utf-8', xml_declaration=True)
\ No newline at end of file
+if __name__ == '__main__':
+    with metrics.run('daddylive_schedule'):
+        main()
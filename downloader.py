@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+# Shared fetch engine used by fetcher.py, epg-grabber/getEpgs.py and the
+# Daddylive scraper. One pooled session keeps connections to the same host
+# (e.g. the 30+ epgshare01.online feeds) alive between requests, every call
+# has a timeout, and transient failures are retried with backoff.
+
+MAX_WORKERS = 8             # concurrent downloads
+POOL_SIZE = 16              # keep-alive connections kept per host
+TIMEOUT = (10, 60)          # (connect, read) seconds
+RETRIES = 3
+BACKOFF = 1.0               # sleeps 1s, 2s, 4s ... between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+class TimeoutSession(requests.Session):
+    """
+    A requests.Session that applies a default timeout to every request.
+    """
+    def __init__(self, timeout=TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+def create_session(pool_size=POOL_SIZE, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+    """
+    Creates a session with per-host connection pooling, a default timeout
+    and retry with exponential backoff (Retry-After is honoured on 429/503).
+    Every response is counted in metrics.
+
+    Parameters:
+    pool_size (int): Keep-alive connections kept per host.
+    retries (int): Retries for connection errors and retryable statuses.
+    backoff (float): Backoff factor between retries.
+    timeout (tuple): Default (connect, read) timeout in seconds.
+
+    Returns:
+    TimeoutSession: The configured session.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = TimeoutSession(timeout)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.hooks['response'].append(metrics.record_response)
+    return session
+
+def get_session():
+    """
+    Returns the process-wide shared session, creating it on first use.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def get(url, session=None, **kwargs):
+    """
+    Performs a GET through the shared (or given) session.
+    """
+    return (session or get_session()).get(url, **kwargs)
+
+def fetch_all(items, handler, max_workers=MAX_WORKERS):
+    """
+    Runs handler(item) for every item with bounded concurrency.
+
+    Total wall-clock time is governed by the slowest items rather than the
+    sum of all of them. Exceptions raised by the handler are caught and
+    printed so one bad source cannot abort the batch.
+
+    Parameters:
+    items (list): The work items, e.g. URLs or {'filename', 'url'} dicts.
+    handler (callable): Function called with a single item.
+    max_workers (int): Maximum number of concurrent handlers.
+
+    Returns:
+    list: The handler results in the same order as items (None on failure).
+    """
+    items = list(items)
+
+    def run(item):
+        try:
+            return handler(item)
+        except Exception as e:
+            print(f"Download failed for {item}: {e}")
+            return None
+
+    if not items:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(run, items))
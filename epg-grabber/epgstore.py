@@ -0,0 +1,216 @@
+import calendar
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Persistent EPG store for getEpgs.py.
+#
+# Every source's filtered <channel> and <programme> elements are kept as
+# serialized XML rows, keyed by (channel, start, source). A run only
+# re-ingests the sources whose body or id filter changed since the last
+# run; the others are reused as they are. The exported guide
+#   - has one definition per channel and one programme per (channel, start),
+#     taken from the earliest source in the URL list that has it,
+#   - only holds programmes overlapping [now - window_past, now + window_future].
+
+DB_FILE = os.environ.get('IPTV_EPG_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'epg_store.sqlite'))
+WINDOW_PAST = 12 * 3600
+WINDOW_FUTURE = 7 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    url         TEXT    PRIMARY KEY,
+    rank        INTEGER NOT NULL,
+    signature   TEXT    NOT NULL,
+    loaded_at   REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    id          TEXT    NOT NULL,
+    source      TEXT    NOT NULL,
+    xml         BLOB    NOT NULL,
+    PRIMARY KEY (id, source)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS programmes (
+    channel     TEXT    NOT NULL,
+    start       INTEGER NOT NULL,
+    source      TEXT    NOT NULL,
+    stop        INTEGER NOT NULL,
+    xml         BLOB    NOT NULL,
+    PRIMARY KEY (channel, start, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS programmes_stop ON programmes (stop);
+"""
+
+_XMLTV_TIME = re.compile(r'^\s*(\d{14})(?:\s*([+-])(\d{2}):?(\d{2}))?')
+
+def parse_xmltv_time(value):
+    """
+    Returns the epoch seconds of an XMLTV time such as '20250101183000 +0100',
+    or None when it cannot be parsed. A missing offset is taken as UTC.
+    """
+    m = _XMLTV_TIME.match(value or '')
+    if not m:
+        return None
+    try:
+        seconds = calendar.timegm(time.strptime(m.group(1), '%Y%m%d%H%M%S'))
+    except ValueError:
+        return None
+    if m.group(2):
+        offset = int(m.group(3)) * 3600 + int(m.group(4)) * 60
+        seconds -= offset if m.group(2) == '+' else -offset
+    return seconds
+
+class EpgStore:
+    """
+    SQLite-backed programme store. Safe to share between worker threads.
+
+    Parameters:
+    path (str): Database file, created on first use.
+    window_past (int): Seconds of past programmes kept.
+    window_future (int): Seconds of future programmes kept.
+    """
+    def __init__(self, path=DB_FILE, window_past=WINDOW_PAST, window_future=WINDOW_FUTURE):
+        self.path = path
+        self.window_past = window_past
+        self.window_future = window_future
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(_SCHEMA)
+        self.db.commit()
+
+    def window(self, now=None):
+        now = time.time() if now is None else now
+        return int(now - self.window_past), int(now + self.window_future)
+
+    def is_current(self, url, signature):
+        """
+        True when the source was last ingested with this signature.
+        """
+        with self.lock:
+            row = self.db.execute('SELECT signature FROM sources WHERE url = ?', (url,)).fetchone()
+        return row is not None and row[0] == signature
+
+    def replace_source(self, url, rank, signature, records, now=None):
+        """
+        Replaces everything stored for one source.
+
+        Parameters:
+        url (str): The source URL.
+        rank (int): Position of the source in the URL list; lower wins.
+        signature (str): Identifies the ingested body and id filter.
+        records (iterable): ('channel', id, None, None, xml) and
+                            ('programme', channel, start, stop, xml) tuples;
+                            start/stop are XMLTV time strings.
+
+        Returns:
+        tuple: (channels, programmes) stored.
+        """
+        low, high = self.window(now)
+        channels, programmes = [], []
+        for kind, key, start, stop, xml in records:
+            if kind == 'channel':
+                channels.append((key, url, xml))
+                continue
+            start, stop = parse_xmltv_time(start), parse_xmltv_time(stop)
+            if start is None:
+                continue
+            if stop is None:
+                stop = start
+            if stop >= low and start <= high:
+                programmes.append((key, start, url, stop, xml))
+
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM channels WHERE source = ?', (url,))
+            self.db.execute('DELETE FROM programmes WHERE source = ?', (url,))
+            self.db.executemany('INSERT OR REPLACE INTO channels VALUES (?, ?, ?)', channels)
+            self.db.executemany('INSERT OR REPLACE INTO programmes VALUES (?, ?, ?, ?, ?)', programmes)
+            self.db.execute(
+                'INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                (url, rank, signature, time.time() if now is None else now),
+            )
+        return len(channels), len(programmes)
+
+    def set_sources(self, urls):
+        """
+        Updates the rank of every listed source and forgets sources that are
+        no longer listed.
+        """
+        with self.lock, self.db:
+            known = [row[0] for row in self.db.execute('SELECT url FROM sources')]
+            for url in known:
+                if url not in urls:
+                    self.db.execute('DELETE FROM channels WHERE source = ?', (url,))
+                    self.db.execute('DELETE FROM programmes WHERE source = ?', (url,))
+                    self.db.execute('DELETE FROM sources WHERE url = ?', (url,))
+            self.db.executemany('UPDATE sources SET rank = ? WHERE url = ?',
+                                [(rank, url) for rank, url in enumerate(urls)])
+
+    def prune(self, now=None):
+        """
+        Drops programmes outside the window. Returns the number removed.
+        """
+        low, high = self.window(now)
+        with self.lock, self.db:
+            cursor = self.db.execute('DELETE FROM programmes WHERE stop < ? OR start > ?', (low, high))
+        return cursor.rowcount
+
+    def export(self, outputs, valid_ids=None, now=None):
+        """
+        Writes the merged guide as XMLTV to every binary file-like object in
+        outputs.
+
+        Parameters:
+        outputs (list): Binary writers, e.g. AtomicFile(..., binary=True).
+        valid_ids (set): When given, channels outside it are left out.
+
+        Returns:
+        tuple: (channels, programmes) written.
+        """
+        low, high = self.window(now)
+
+        def write(data):
+            for out in outputs:
+                out.write(data)
+
+        write(b"<?xml version='1.0' encoding='utf-8'?>\n<tv>\n")
+        channels = programmes = 0
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT c.id, c.xml FROM channels c JOIN sources s ON s.url = c.source '
+                'ORDER BY c.id, s.rank'
+            )
+            last = None
+            for channel_id, xml in rows:
+                if channel_id == last or (valid_ids is not None and channel_id not in valid_ids):
+                    continue
+                last = channel_id
+                write(xml)
+                channels += 1
+
+            rows = self.db.execute(
+                'SELECT p.channel, p.start, p.xml FROM programmes p JOIN sources s ON s.url = p.source '
+                'WHERE p.stop >= ? AND p.start <= ? ORDER BY p.channel, p.start, s.rank',
+                (low, high),
+            )
+            last = None
+            for channel_id, start, xml in rows:
+                if (channel_id, start) == last or (valid_ids is not None and channel_id not in valid_ids):
+                    continue
+                last = (channel_id, start)
+                write(xml)
+                programmes += 1
+        write(b"</tv>\n")
+        return channels, programmes
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,71 +1,253 @@
 import os
+import re
+import sys
 import gzip
+import hashlib
+import multiprocessing
 import xml.etree.ElementTree as ET
-import requests
+from concurrent.futures import Future, ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import downloader
+import httpcache
+import epgstore
+import metrics
+import rules
+from atomicfile import AtomicFile
 
 save_as_gz = True  # Set to True to save an additional .gz version
+source_ttl = 3600  # Seconds a cached source is reused before it is revalidated
+store_file = epgstore.DB_FILE  # SQLite store the guide is merged and exported from
+keep_past = 12 * 3600  # Seconds of past programmes kept in the guide
+keep_future = 7 * 86400  # Seconds of upcoming programmes kept in the guide
+parse_workers = os.cpu_count() or 1  # Processes parsing sources in parallel; 1 parses in-process
 
 tvg_ids_file = os.path.join(os.path.dirname(__file__), 'tvg-ids.txt')
+rules_file = os.path.join(os.path.dirname(__file__), 'title-rules.json')
 output_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'epg.xml')
 output_file_gz = output_file + '.gz'
 
-def fetch_and_extract_xml(url):
-    response = requests.get(url)
-    if response.status_code != 200:
+def load_title_rules(path):
+    """
+    Returns the RuleSet in path (see rules.py for the file format). A
+    missing or invalid rules file gives an empty RuleSet, so a bad edit
+    stops the rewrites instead of the whole guide.
+    """
+    if not os.path.isfile(path):
+        return rules.RuleSet()
+    try:
+        return rules.RuleSet.load(path)
+    except (OSError, ValueError, re.error) as e:
+        print(f"Ignoring title rules in {path}: {e}")
+        return rules.RuleSet()
+
+# Programme title rules, compiled once
+title_rules = load_title_rules(rules_file)
+
+@metrics.timed()
+def fetch_source(url):
+    """
+    Returns the CacheResult for url, or None on failure. The body comes from
+    the on-disk HTTP cache, which streams downloads to disk and revalidates
+    unchanged sources with a 304.
+    """
+    result = httpcache.get_cache().fetch(url, source_ttl)
+    if result is None:
         print(f"Failed to fetch {url}")
-        return None
+    return result
 
+def open_xml_stream(url, path):
+    """
+    Returns a file-like object that yields the decompressed XML bytes of a
+    cached source body, so the full document is never held in memory.
+    """
     if url.endswith('.gz'):
-        try:
-            decompressed_data = gzip.decompress(response.content)
-            return ET.fromstring(decompressed_data)
-        except Exception as e:
-            print(f"Failed to decompress and parse XML from {url}: {e}")
-            return None
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def filter_digest(valid_tvg_ids):
+    """
+    Digest of everything applied to a source besides its body: the id set
+    and the title rules. Changing either re-parses every source.
+    """
+    digest = hashlib.sha1('\n'.join(sorted(valid_tvg_ids)).encode())
+    if os.path.isfile(rules_file):
+        with open(rules_file, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def source_signature(result, ids_digest):
+    """
+    Identifies a cached body together with the id filter applied to it; the
+    store skips a source whose signature did not change. A re-downloaded
+    body with the same content keeps its signature.
+    """
+    if result.digest:
+        return f"{result.digest}:{ids_digest}"
+    stat = os.stat(result.path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{ids_digest}"
+
+def iter_epg_elements(source):
+    """
+    Incrementally parses an XMLTV stream and yields every top-level
+    <channel> and <programme> element. Each element is detached from the
+    document root once the caller is done with it, so memory stays bounded
+    by the size of a single element rather than the whole document.
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+    depth = 0
+    root = None
+    for event, elem in context:
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1 and elem.tag in ('channel', 'programme'):
+            yield elem
+            root.clear()
+
+def element_record(elem):
+    """
+    Returns the compact record the store keeps for a kept element:
+    ('channel', id, None, None, xml) or ('programme', channel, start, stop, xml).
+    """
+    elem.tail = '\n'
+    xml = ET.tostring(elem, encoding='utf-8', xml_declaration=False)
+    if elem.tag == 'channel':
+        return ('channel', elem.get('id'), None, None, xml)
+    return ('programme', elem.get('channel'), elem.get('start'), elem.get('stop'), xml)
+
+def filter_source(url, path, valid_tvg_ids):
+    """
+    Parses one cached source body and returns the records of the channels
+    and programmes whose id is in valid_tvg_ids, or None when the source
+    could not be parsed.
+    """
+    source = open_xml_stream(url, path)
+    records = []
+    try:
+        for elem in iter_epg_elements(source):
+            if elem.tag == 'channel':
+                if elem.get('id') not in valid_tvg_ids:
+                    continue
+            elif elem.get('channel') not in valid_tvg_ids or not title_rules.apply(elem):
+                continue
+
+            records.append(element_record(elem))
+    except Exception as e:
+        print(f"Failed to decompress and parse XML from {url}: {e}")
+        return None
+    finally:
+        source.close()
+
+    return records
+
+_worker_tvg_ids = None
+
+def _init_parser(valid_tvg_ids):
+    global _worker_tvg_ids
+    _worker_tvg_ids = valid_tvg_ids
+
+def parse_source(url, path):
+    """
+    Process-pool task: filter_source against the id set handed to every
+    worker once by _init_parser.
+    """
+    return filter_source(url, path, _worker_tvg_ids)
+
+def submit_source(store, pool, url, valid_tvg_ids, ids_digest):
+    """
+    Fetches one source and, unless the store already holds this exact body
+    filtered with the same ids, queues it for parsing.
+
+    Returns:
+    tuple: (signature, Future of the records, or None when the stored rows
+           are still current), or None when the source could not be fetched.
+    """
+    result = fetch_source(url)
+    if result is None:
+        return None
+
+    signature = source_signature(result, ids_digest)
+    if store.is_current(url, signature):
+        print(f"Unchanged, reusing stored programmes from {url}")
+        return signature, None
+
+    if pool is None:
+        future = Future()
+        future.set_result(filter_source(url, result.path, valid_tvg_ids))
     else:
-        try:
-            return ET.fromstring(response.content)
-        except Exception as e:
-            print(f"Failed to parse XML from {url}: {e}")
-            return None
+        future = pool.submit(parse_source, url, result.path)
+    return signature, future
 
-def filter_and_build_epg(urls):
+@metrics.timed()
+def filter_and_build_epg(urls, max_workers=downloader.MAX_WORKERS, parse_workers=parse_workers):
     with open(tvg_ids_file, 'r') as file:
         valid_tvg_ids = set(line.strip() for line in file)
+    ids_digest = filter_digest(valid_tvg_ids)
 
-    root = ET.Element('tv')
+    # Download threads hand every changed source to a process pool as soon
+    # as it is on disk, so decompressing and parsing run on all cores while
+    # the other downloads continue. The records are stored in URL order.
+    # The workers are started from a download thread, so they must not be
+    # forked from this process: locks other threads hold at that moment
+    # (stdout, SSL, the cache) would be copied into them held. forkserver
+    # forks them from a clean single-threaded server instead.
+    pool = None
+    if parse_workers > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        pool = ProcessPoolExecutor(parse_workers, mp_context=context,
+                                   initializer=_init_parser, initargs=(valid_tvg_ids,))
 
-    for url in urls:
-        epg_data = fetch_and_extract_xml(url)
-        if epg_data is None:
-            continue
-
-        for channel in epg_data.findall('channel'):
-            tvg_id = channel.get('id')
-            if tvg_id in valid_tvg_ids:
-                root.append(channel)
+    with epgstore.EpgStore(store_file, keep_past, keep_future) as store:
+        store.set_sources(urls)
+        try:
+            jobs = downloader.fetch_all(urls, lambda url: submit_source(store, pool, url, valid_tvg_ids, ids_digest),
+                                        max_workers)
+            for rank, (url, job) in enumerate(zip(urls, jobs)):
+                if job is None or job[1] is None:
+                    continue
+                signature, future = job
+                try:
+                    records = future.result()
+                except Exception as e:
+                    print(f"Failed to parse XML from {url}: {e}")
+                    continue
+                if records is None:
+                    continue
+                channels, programmes = store.replace_source(url, rank, signature, records)
+                print(f"{channels} channels and {programmes} programmes stored from {url}")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
 
-        for programme in epg_data.findall('programme'):
-            tvg_id = programme.get('channel')
-            if tvg_id in valid_tvg_ids:
-                title = programme.find('title')
-                if title is not None:
-                    title_text = title.text if title is not None else 'No title'
+        pruned = store.prune()
+        if pruned:
+            print(f"{pruned} programmes outside the time window dropped")
 
-                    if title_text == 'NHL Hockey' or title_text == 'Live: NFL Football':
-                        subtitle = programme.find('sub-title')
-                        subtitle_text = subtitle.text if subtitle else 'No subtitle'
-                        programme.find('title').text = title_text + " " + subtitle_text
+        # Both outputs only replace the previous guide once fully written
+        outputs = [AtomicFile(output_file, binary=True)]
+        if save_as_gz:
+            outputs.append(AtomicFile(output_file_gz, binary=True))
 
-                    root.append(programme)
+        try:
+            with metrics.stage('export'):
+                channels, programmes = store.export(outputs, valid_tvg_ids)
+        except BaseException:
+            for out in outputs:
+                out.discard()
+            raise
+        for out in outputs:
+            out.close()
 
-    tree = ET.ElementTree(root)
-    tree.write(output_file, encoding='utf-8', xml_declaration=True)
-    print(f"New EPG saved to {output_file}")
+    httpcache.get_cache().prune()
 
+    print(f"New EPG saved to {output_file} ({channels} channels, {programmes} programmes)")
     if save_as_gz:
-        with gzip.open(output_file_gz, 'wb') as f:
-            tree.write(f, encoding='utf-8', xml_declaration=True)
         print(f"New EPG saved to {output_file_gz}")
 
 m3u4u_epg = os.getenv("M3U4U_EPG")
@@ -112,4 +294,5 @@ urls = [
 ]
 
 if __name__ == "__main__":
-    filter_and_build_epg(urls)
+    with metrics.run('epg'):
+        filter_and_build_epg(urls)
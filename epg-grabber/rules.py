@@ -0,0 +1,128 @@
+import json
+import re
+import string
+
+# Programme transform rules for getEpgs.py.
+#
+# A rules file is a JSON list; each rule matches a programme title either
+# exactly ("title") or with a regular expression ("regex", searched in the
+# title) and then either drops the programme ("drop": true) or rewrites its
+# title from a template:
+#
+#   {"title": "NHL Hockey", "rewrite": "{title} {sub-title}",
+#    "defaults": {"sub-title": "No subtitle"}}
+#
+# Templates may use {title}, {sub-title}, {category}, {desc} and the named
+# groups of a regex rule. A field the programme does not have is taken from
+# "defaults", or left empty.
+#
+# Rules are tried in file order and the first one that matches wins. Each
+# regex is compiled on its own, so rules may reuse group names and use
+# inline flags or backreferences. Exact titles are a dict lookup; only the
+# regex rules listed before an exact hit are searched ahead of it. The rule
+# found for a title is memoized, and guides repeat the same titles all
+# week, so most programmes cost a single dict lookup. Sub-title, category
+# and desc are only looked up on programmes a rule matched.
+
+FIELDS = ('title', 'sub-title', 'category', 'desc')
+CACHE_SIZE = 1 << 16
+_NO_MATCH = (None, None)
+
+class Rule:
+    __slots__ = ('template', 'fields', 'defaults', 'drop')
+
+    def __init__(self, spec):
+        self.drop = bool(spec.get('drop'))
+        self.template = spec.get('rewrite')
+        self.defaults = dict(spec.get('defaults', {}))
+        if not self.drop and not self.template:
+            raise ValueError(f"Rule needs 'rewrite' or 'drop': {spec}")
+        self.fields = set()
+        if self.template:
+            self.fields = {name for _, name, _, _ in string.Formatter().parse(self.template) if name}
+
+    def render(self, values):
+        for name in self.fields:
+            if not values.get(name):
+                values[name] = self.defaults.get(name, '')
+        return self.template.format_map(values).strip()
+
+class RuleSet:
+    """
+    Compiled programme rules.
+
+    Parameters:
+    specs (list): Rule dicts as described at the top of this module.
+    """
+    def __init__(self, specs=()):
+        self.exact = {}         # title -> (position, rule)
+        self.regexes = []       # (position, compiled pattern, rule) in file order
+        self.cache = {}
+
+        for i, spec in enumerate(specs):
+            rule = Rule(spec)
+            if 'title' in spec:
+                self.exact.setdefault(spec['title'], (i, rule))
+            elif 'regex' in spec:
+                self.regexes.append((i, re.compile(spec['regex']), rule))
+            else:
+                raise ValueError(f"Rule needs 'title' or 'regex': {spec}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def __len__(self):
+        return len(self.exact) + len(self.regexes)
+
+    def match(self, title):
+        """
+        Returns (rule, regex groups) for a title, or (None, None).
+        """
+        found = self.cache.get(title)
+        if found is None:
+            found = self._match(title)
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            self.cache[title] = found
+        return found
+
+    def _match(self, title):
+        position, rule = self.exact.get(title, _NO_MATCH)
+        for i, pattern, regex_rule in self.regexes:
+            if rule is not None and i > position:
+                break
+            m = pattern.search(title)
+            if m:
+                return regex_rule, {k: v for k, v in m.groupdict().items() if v is not None}
+        if rule is not None:
+            return rule, {}
+        return _NO_MATCH
+
+    def apply(self, programme):
+        """
+        Applies the rules to a <programme> element in place.
+
+        Returns:
+        bool: False when the programme should be dropped (no title, or a
+              drop rule matched), otherwise True.
+        """
+        title = programme.find('title')
+        if title is None:
+            return False
+        title_text = title.text or ''
+
+        rule, groups = self.cache.get(title_text) or self.match(title_text)
+        if rule is None:
+            return True
+        if rule.drop:
+            return False
+
+        values = dict(groups, title=title_text)
+        for name in rule.fields:
+            if name not in values:
+                child = programme.find(name)
+                values[name] = (child.text or '') if child is not None else ''
+        title.text = rule.render(values)
+        return True
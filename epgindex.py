@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+# Channel-id index over a set of XMLTV files.
+#
+# Built once per run (or loaded from disk when the source files have not
+# changed) and then queried per channel in O(1):
+#   ids    id -> source file the id was first seen in
+#   names  normalised name / name prefix -> [ids] in source order
+
+INDEX_VERSION = 1
+
+def normalize(text):
+    """
+    Lower-cases text and drops everything except letters and digits.
+    """
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+def name_keys(text):
+    """
+    Returns the lookup keys for a channel name: the normalised full name and
+    every leading run of words, so 'Fox Sports 1 HD' is reachable through
+    'foxsports1hd', 'foxsports1', 'foxsports' and 'fox'.
+    """
+    words = re.sub(r'[^a-z0-9]+', ' ', text.lower()).split()
+    return {''.join(words[:i]) for i in range(1, len(words) + 1)}
+
+def _id_name(channel_id):
+    # 'ABC.(WABC).New.York,.NY.us' -> 'ABC (WABC) New York, NY'
+    parts = channel_id.split('.')
+    if len(parts) > 1 and len(parts[-1]) == 2:
+        parts = parts[:-1]
+    return ' '.join(parts)
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, int(stat.st_mtime)]
+
+class EpgIdIndex:
+    def __init__(self):
+        self.ids = {}
+        self.names = {}
+        self.sources = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, channel_id):
+        return channel_id in self.ids
+
+    def source(self, channel_id):
+        return self.ids.get(channel_id)
+
+    def lookup(self, name):
+        """
+        Returns the ids whose name or display-name starts with the given
+        name (compared normalised), in source order.
+        """
+        return self.names.get(normalize(name), [])
+
+    def _add_name(self, text, channel_id):
+        for key in name_keys(text):
+            bucket = self.names.setdefault(key, [])
+            if not bucket or bucket[-1] != channel_id:
+                bucket.append(channel_id)
+
+    def add_file(self, file_path):
+        """
+        Adds every <channel> of an XMLTV file, streaming it with iterparse.
+        Ids already present keep their first source.
+
+        Returns:
+        int: The number of new ids.
+        """
+        added = 0
+        try:
+            context = ET.iterparse(file_path, events=('start', 'end'))
+            _, root = next(context)
+            for event, elem in context:
+                if event != 'end':
+                    continue
+                if elem.tag == 'channel':
+                    channel_id = elem.get('id')
+                    if channel_id and channel_id not in self.ids:
+                        self.ids[channel_id] = file_path
+                        self._add_name(_id_name(channel_id), channel_id)
+                        for display_name in elem.iterfind('display-name'):
+                            if display_name.text:
+                                self._add_name(display_name.text, channel_id)
+                        added += 1
+                    root.clear()
+                elif elem.tag == 'programme':
+                    root.clear()
+        except FileNotFoundError:
+            print(f'The file {file_path} does not exist.')
+        except (ET.ParseError, StopIteration):
+            print(f'The file {file_path} is not a valid XML file.')
+
+        self.sources[file_path] = _signature(file_path)
+        return added
+
+    def save(self, index_path):
+        with open(index_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': INDEX_VERSION, 'sources': self.sources,
+                       'ids': self.ids, 'names': self.names}, file)
+
+    @classmethod
+    def load(cls, index_path, file_paths):
+        """
+        Loads a saved index, or returns None when it is missing or any of the
+        source files changed since it was built.
+        """
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != INDEX_VERSION:
+            return None
+        if set(data['sources']) != set(file_paths):
+            return None
+        if any(data['sources'][path] != _signature(path) for path in file_paths):
+            return None
+
+        index = cls()
+        index.sources = data['sources']
+        index.ids = data['ids']
+        index.names = data['names']
+        return index
+
+def build_index(file_paths, index_path=None):
+    """
+    Returns the channel-id index for file_paths, reusing index_path when it
+    is still up to date and rewriting it otherwise.
+    """
+    if index_path:
+        index = EpgIdIndex.load(index_path, file_paths)
+        if index is not None:
+            print(f'Loaded EPG id index from {index_path} ({len(index)} ids).')
+            return index
+
+    index = EpgIdIndex()
+    for file_path in file_paths:
+        index.add_file(file_path)
+
+    if index_path:
+        index.save(index_path)
+    print(f'Built EPG id index with {len(index)} ids.')
+    return index
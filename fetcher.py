@@ -1,39 +1,61 @@
 import gzip
-import requests
 import os
-import xml.etree.ElementTree as ET
+import shutil
+import downloader
+import httpcache
+import metrics
 
-def fetchXML(filename, url):
-    
-    if doesFileExist(filename):
-        return
-    
-    response = requests.get(url)
-    if response.status_code != 200:
+# Responses are kept in httpcache's on-disk cache and revalidated with
+# ETag / Last-Modified, so an unchanged source costs a single 304 instead of
+# a full download. A ttl (seconds) skips even the revalidation request.
+
+@metrics.timed()
+def fetchXML(filename, url, ttl=None):
+
+    result = httpcache.get_cache().fetch(url, ttl)
+    if result is None:
         print(f"Failed to fetch {url}")
+        return
+
+    if not result.changed and os.path.isfile(filename):
+        print(f'{url} unchanged ({result.status}), keeping {filename}.')
+        return
 
     if url.endswith('.gz'):
         try:
-            decompressed_data = gzip.decompress(response.content)
-            saveFileAsBytes(filename, decompressed_data)
+            with gzip.open(result.path, 'rb') as source, open(filename, 'wb') as file:
+                shutil.copyfileobj(source, file)
         except Exception as e:
             print(f"Failed to decompress and parse XML from {url}: {e}")
     else:
         try:
-            saveFileAsBytes(filename, response.content)
+            shutil.copyfile(result.path, filename)
         except Exception as e:
             print(f"Failed to parse XML from {url}: {e}")
 
-def fetchHTML(filename, url):
+@metrics.timed()
+def fetchXMLs(epgs, max_workers=downloader.MAX_WORKERS):
+    """
+    Fetches every {'filename', 'url'} entry concurrently over the shared
+    connection pool. An entry may carry its own 'ttl' in seconds.
+    """
+    downloader.fetch_all(epgs, lambda epg: fetchXML(epg['filename'], epg['url'], epg.get('ttl')), max_workers)
+    httpcache.get_cache().prune()
 
-    if doesFileExist(filename):
+@metrics.timed()
+def fetchHTML(filename, url, ttl=None):
+
+    result = httpcache.get_cache().fetch(url, ttl)
+    if result is None:
+        print(f"Failed to fetch {url}")
+        return
+
+    if not result.changed and os.path.isfile(filename):
+        print(f'{url} unchanged ({result.status}), keeping {filename}.')
         return
-    
-    # Send a GET request to the URL
-    response = requests.get(url)    
 
     # Write the content to the file
-    saveFile(filename, response.text)
+    saveFile(filename, result.read().decode('utf-8', errors='replace'))
 
     print(f'Webpage downloaded and saved to {filename}')
 
@@ -44,10 +66,3 @@ def saveFile(filename, content):
 def saveFileAsBytes(filename, content):
     with open(filename, 'wb') as file:
         file.write(content)
-
-def doesFileExist(filename):
-    if os.path.isfile(filename):
-        print(f'File exists, not download new version {filename}.')
-        return True
-    else:
-        return False
\ No newline at end of file
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+import downloader
+import metrics
+
+# On-disk HTTP cache with conditional revalidation.
+#
+# Each URL is stored as two files named after the SHA-1 of the URL:
+#   <key>.body  the response body exactly as received (still gzipped for .gz sources)
+#   <key>.json  url, ETag, Last-Modified, fetch/use timestamps and size
+#
+# Within an entry's TTL the cached body is used without any request. After
+# that the entry is revalidated with If-None-Match / If-Modified-Since and a
+# 304 refreshes it without re-downloading the body.
+
+CACHE_DIR = os.environ.get('IPTV_HTTP_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http-cache'))
+DEFAULT_TTL = 0                     # seconds an entry is trusted without revalidating
+MAX_AGE = 7 * 24 * 3600             # entries unused for longer than this are evicted
+MAX_BYTES = 2 * 1024 ** 3           # total body size kept on disk
+CHUNK_SIZE = 1024 * 1024
+
+_cache = None
+_cache_lock = threading.Lock()
+
+class CacheResult:
+    """
+    The outcome of HTTPCache.fetch.
+
+    path (str): Path of the cached body on disk.
+    status (str): 'fresh' (within TTL, no request), 'revalidated' (304),
+                  'downloaded' (200) or 'stale' (request failed, old copy served).
+    changed (bool): True when the body differs from what was cached before.
+    digest (str): SHA-1 of the body, None for entries cached before it was recorded.
+    """
+    __slots__ = ('url', 'path', 'status', 'changed', 'digest')
+
+    def __init__(self, url, path, status, changed, digest=None):
+        self.url = url
+        self.path = path
+        self.status = status
+        self.changed = changed
+        self.digest = digest
+
+    @property
+    def hit(self):
+        return self.status != 'downloaded'
+
+    def open(self):
+        return open(self.path, 'rb')
+
+    def read(self):
+        with self.open() as file:
+            return file.read()
+
+class HTTPCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.body', base + '.json'
+
+    def _load_meta(self, meta_path, body_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(body_path):
+            return None
+        return meta
+
+    def _save_meta(self, meta_path, meta):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(tmp, meta_path)
+
+    def fetch(self, url, ttl=None, session=None, headers=None):
+        """
+        Returns a CacheResult for url, downloading or revalidating as needed.
+
+        Parameters:
+        url (str): The URL to fetch.
+        ttl (int): Seconds a cached copy is used without revalidation.
+        session (requests.Session): Session to use, defaults to the shared one.
+        headers (dict): Extra request headers.
+
+        Returns:
+        CacheResult: The cached body, or None if nothing could be fetched.
+        """
+        ttl = DEFAULT_TTL if ttl is None else ttl
+        body_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path, body_path)
+        now = time.time()
+
+        if meta and now - meta['fetched_at'] < ttl:
+            meta['used_at'] = now
+            self._save_meta(meta_path, meta)
+            metrics.count_url(url, cache_hits=1)
+            return CacheResult(url, body_path, 'fresh', False, meta.get('sha1'))
+
+        request_headers = dict(headers or {})
+        if meta:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+            elif not meta.get('etag'):
+                request_headers['If-Modified-Since'] = formatdate(meta['fetched_at'], usegmt=True)
+
+        try:
+            response = downloader.get(url, session=session, headers=request_headers, stream=True)
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            metrics.count_url(url, errors=1)
+            return self._stale(url, body_path, meta)
+
+        with response:
+            if response.status_code == 304 and meta:
+                meta['fetched_at'] = meta['used_at'] = now
+                self._save_meta(meta_path, meta)
+                metrics.count_url(url, cache_hits=1)
+                return CacheResult(url, body_path, 'revalidated', False, meta.get('sha1'))
+
+            if response.status_code != 200:
+                print(f"Failed to fetch {url} (HTTP {response.status_code})")
+                return self._stale(url, body_path, meta)
+
+            response.raw.decode_content = True
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                digest = hashlib.sha1()
+                with os.fdopen(fd, 'wb') as file:
+                    while True:
+                        chunk = response.raw.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        file.write(chunk)
+                os.replace(tmp, body_path)
+            except Exception as e:
+                os.unlink(tmp)
+                print(f"Failed to download {url}: {e}")
+                return self._stale(url, body_path, meta)
+
+            if 'Content-Length' not in response.headers:
+                # chunked responses are not counted by the session hook
+                metrics.count_url(url, bytes=os.path.getsize(body_path))
+            self._save_meta(meta_path, {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': now,
+                'used_at': now,
+                'size': os.path.getsize(body_path),
+                'sha1': digest.hexdigest(),
+            })
+
+        changed = meta is None or meta.get('sha1') != digest.hexdigest()
+        return CacheResult(url, body_path, 'downloaded', changed, digest.hexdigest())
+
+    def _stale(self, url, body_path, meta):
+        if meta is None:
+            return None
+        print(f"Using cached copy of {url}")
+        metrics.count_url(url, cache_hits=1)
+        return CacheResult(url, body_path, 'stale', False, meta.get('sha1'))
+
+    def entries(self):
+        """
+        Yields (meta, body_path, meta_path) for every cache entry.
+        """
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[:-len('.json')] + '.body'
+            meta = self._load_meta(meta_path, body_path)
+            yield meta, body_path, meta_path
+
+    def prune(self):
+        """
+        Evicts entries unused for longer than max_age, then the least
+        recently used entries until the total size fits in max_bytes.
+
+        Returns:
+        int: The number of entries removed.
+        """
+        now = time.time()
+        kept = []
+        removed = 0
+
+        for meta, body_path, meta_path in list(self.entries()):
+            if meta is None or now - meta.get('used_at', 0) > self.max_age:
+                removed += self._remove(body_path, meta_path)
+            else:
+                kept.append((meta.get('used_at', 0), meta.get('size', 0), body_path, meta_path))
+
+        total = sum(size for _, size, _, _ in kept)
+        for _, size, body_path, meta_path in sorted(kept):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(body_path, meta_path)
+            total -= size
+
+        return removed
+
+    def _remove(self, body_path, meta_path):
+        for path in (body_path, meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return 1
+
+def get_cache():
+    """
+    Returns the process-wide cache in CACHE_DIR, creating it on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HTTPCache()
+        return _cache
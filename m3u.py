@@ -0,0 +1,170 @@
+import base64
+import re
+from atomicfile import AtomicFile
+
+# Shared M3U playlist model: a streaming parser that yields compact Entry
+# objects, #EXTINF formatting and a buffered writer. Used by
+# all_channels/main.py, Events/events.py, daddyliveSchedule.py and the
+# Daddylive scraper so every playlist is read and written the same way.
+
+PROXY_MARKER = '/watch/'
+
+_EXTINF = re.compile(r'^#EXTINF:(-?\d+(?:\.\d+)?)((?:\s+[\w-]+="[^"]*")*)\s*,(.*)$')
+_ATTR = re.compile(r'([\w-]+)="([^"]*)"')
+
+class Entry:
+    """
+    One playlist item.
+
+    duration (str): The #EXTINF duration, normally '-1'.
+    attrs (dict): tvg-id, tvg-logo, group-title, ... in file order.
+    title (str): Display title after the comma.
+    options (list): '#' lines between #EXTINF and the URL (#EXTVLCOPT, #KODIPROP, ...).
+    url (str): The stream URL.
+    target (str): The stream behind a /watch/<base64>.m3u8 proxy URL, or None.
+    """
+    __slots__ = ('duration', 'attrs', 'title', 'options', 'url', 'target')
+
+    def __init__(self, attrs, title, url, options=None, duration='-1', target=None):
+        self.duration = duration
+        self.attrs = attrs
+        self.title = title
+        self.options = options or []
+        self.url = url
+        self.target = target if target is not None else decode_proxy(url)
+
+    def extinf(self):
+        return format_extinf(self.attrs, self.title, self.duration)
+
+    def lines(self):
+        return [self.extinf(), *self.options, self.url]
+
+def format_extinf(attrs, title, duration='-1'):
+    """
+    Formats an #EXTINF line; attributes keep the order of the dict.
+    """
+    text = ''.join(f' {key}="{value}"' for key, value in attrs.items())
+    return f'#EXTINF:{duration}{text},{title}'
+
+def parse_extinf(line):
+    """
+    Returns (duration, attrs, title) for an #EXTINF line, or None.
+    """
+    m = _EXTINF.match(line)
+    if not m:
+        return None
+    return m.group(1), dict(_ATTR.findall(m.group(2))), m.group(3)
+
+def encode_proxy(url, prefix):
+    return f'{prefix}{base64.b64encode(url.encode()).decode()}.m3u8'
+
+def decode_proxy(url):
+    """
+    Returns the stream behind a '.../watch/<base64>.m3u8' proxy URL, or None.
+    """
+    if not url or PROXY_MARKER not in url:
+        return None
+    try:
+        b64 = url.split(PROXY_MARKER)[1].split('.m3u8')[0]
+        return base64.b64decode(b64).decode().strip()
+    except Exception:
+        return None
+
+def parse(source):
+    """
+    Streams a playlist and yields Entry objects. Every line that is not part
+    of an entry (#EXTM3U headers, blank or malformed lines) is yielded as a
+    plain string, so writing everything back reproduces the file.
+
+    Parameters:
+    source (str | iterable): A file path or an iterable of lines.
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as file:
+            yield from parse(file)
+        return
+
+    pending = None      # (extinf line, parsed extinf, options)
+    for line in source:
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
+
+        if pending is None:
+            if stripped.startswith('#EXTINF'):
+                parsed = parse_extinf(stripped)
+                if parsed:
+                    pending = (line, parsed, [])
+                    continue
+            yield line
+            continue
+
+        if stripped.startswith('#EXTINF'):
+            # previous #EXTINF had no URL
+            yield pending[0]
+            yield from pending[2]
+            parsed = parse_extinf(stripped)
+            pending = (line, parsed, []) if parsed else None
+            if not parsed:
+                yield line
+        elif stripped.startswith('#') or not stripped:
+            pending[2].append(line)
+        else:
+            duration, attrs, title = pending[1]
+            yield Entry(attrs, title, stripped, pending[2], duration)
+            pending = None
+
+    if pending is not None:
+        yield pending[0]
+        yield from pending[2]
+
+def entries(source):
+    """
+    Yields only the Entry objects of a playlist.
+    """
+    return (item for item in parse(source) if isinstance(item, Entry))
+
+class Writer:
+    """
+    Buffered playlist writer. The playlist replaces `path` atomically when
+    the writer is closed, and is discarded if the block raises.
+
+        with m3u.Writer('out.m3u8', header=['#EXTM3U']) as out:
+            out.add({'tvg-id': 'x'}, 'Title', url)
+    """
+    def __init__(self, path, header=None, spacer=False):
+        self.path = path
+        self.spacer = spacer
+        self.count = 0
+        self.file = AtomicFile(path)
+        for line in header or []:
+            self.file.write(line + '\n')
+
+    def write(self, item):
+        """
+        Writes an Entry or a raw line.
+        """
+        if isinstance(item, Entry):
+            self.file.write('\n'.join(item.lines()) + '\n')
+            if self.spacer:
+                self.file.write('\n')
+            self.count += 1
+        else:
+            self.file.write(item + '\n')
+
+    def add(self, attrs, title, url, options=None):
+        self.write(Entry(attrs, title, url, options, target=''))
+
+    def close(self):
+        self.file.close()
+
+    def discard(self):
+        self.file.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
@@ -0,0 +1,197 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+from atomicfile import AtomicFile
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+# Per-run instrumentation shared by every pipeline script.
+#
+#   with metrics.run('events'):          # one job run, exported on exit
+#       with metrics.stage('parse'):     # time a block
+#           ...
+#
+#   @metrics.timed('get_schedule')       # time every call of a function
+#   def get_schedule(): ...
+#
+# HTTP traffic is counted per host: sessions from downloader.create_session
+# report every response through record_response, httpcache reports cache
+# hits and the mirrors engine reports its probes. When the run ends one JSON
+# line is appended to METRICS_DIR/<job>.jsonl (the history to chart) and
+# METRICS_DIR/<job>.prom is replaced with the Prometheus text format of the
+# same run, for a node_exporter textfile collector or a push gateway.
+
+METRICS_DIR = os.environ.get('IPTV_METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics'))
+PREFIX = 'iptv'
+HOST_FIELDS = ('requests', 'bytes', 'cache_hits', 'errors')
+
+_lock = threading.Lock()
+_stages = {}
+_hosts = {}
+_listeners = []
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes, or None when unknown.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def add_listener(listener):
+    """
+    Calls listener.enter(name) and listener.exit(name) around every stage,
+    in the thread running it (profiling.py uses this).
+    """
+    _listeners.append(listener)
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _hosts.clear()
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times the block under `name`. Repeated and concurrent uses add up.
+    """
+    for listener in _listeners:
+        listener.enter(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for listener in reversed(_listeners):
+            listener.exit(name)
+        with _lock:
+            entry = _stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += elapsed
+            entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+            entry['peak_rss'] = peak_rss()
+
+def timed(name=None):
+    """
+    Decorator form of stage(); the name defaults to the function's name.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(host, **fields):
+    """
+    Adds to the counters of one host, e.g. count('epgshare01.online', requests=1).
+    """
+    with _lock:
+        entry = _hosts.setdefault(host or '', dict.fromkeys(HOST_FIELDS, 0))
+        for key, value in fields.items():
+            entry[key] += value
+
+def count_url(url, **fields):
+    count(urlsplit(url).hostname, **fields)
+
+def record_response(response, *args, **kwargs):
+    """
+    requests response hook: one request, its Content-Length and whether it
+    failed. Install with session.hooks['response'].append(record_response).
+    """
+    count_url(response.url, requests=1, errors=int(response.status_code >= 400),
+              bytes=int(response.headers.get('Content-Length') or 0))
+
+def snapshot(job, started_at, duration):
+    with _lock:
+        return {
+            'job': job,
+            'started_at': started_at,
+            'duration': duration,
+            'peak_rss': peak_rss(),
+            'stages': {name: dict(entry) for name, entry in _stages.items()},
+            'hosts': {host: dict(entry) for host, entry in _hosts.items()},
+        }
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus(data):
+    """
+    Returns a run snapshot in the Prometheus text exposition format.
+    """
+    job = _label(data['job'])
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+        for labels, value in samples:
+            if value is None:
+                continue
+            text = ','.join([f'job="{job}"'] + [f'{k}="{_label(v)}"' for k, v in labels.items()])
+            lines.append(f'{PREFIX}_{name}{{{text}}} {value}')
+
+    metric('run_timestamp_seconds', 'gauge', 'Start time of the run.', [({}, data['started_at'])])
+    metric('run_duration_seconds', 'gauge', 'Wall-clock time of the run.', [({}, data['duration'])])
+    metric('peak_rss_bytes', 'gauge', 'Peak resident set size of the run.', [({}, data['peak_rss'])])
+
+    stages = sorted(data['stages'].items())
+    metric('stage_seconds', 'gauge', 'Total time spent in a stage.',
+           [({'stage': name}, entry['seconds']) for name, entry in stages])
+    metric('stage_calls', 'gauge', 'Times a stage was entered.',
+           [({'stage': name}, entry['calls']) for name, entry in stages])
+    metric('stage_max_seconds', 'gauge', 'Longest single call of a stage.',
+           [({'stage': name}, entry['max_seconds']) for name, entry in stages])
+    metric('stage_peak_rss_bytes', 'gauge', 'Peak resident set size when a stage last finished.',
+           [({'stage': name}, entry.get('peak_rss')) for name, entry in stages])
+
+    hosts = sorted(data['hosts'].items())
+    for field in HOST_FIELDS:
+        metric(f'http_{field}', 'gauge', f'HTTP {field.replace("_", " ")} per host.',
+               [({'host': host}, entry[field]) for host, entry in hosts])
+    return '\n'.join(lines) + '\n'
+
+def write(data, directory=METRICS_DIR):
+    """
+    Appends the snapshot to <job>.jsonl and replaces <job>.prom.
+    """
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, data['job'])
+    with open(base + '.jsonl', 'a', encoding='utf-8') as file:
+        file.write(json.dumps(data, sort_keys=True) + '\n')
+    with AtomicFile(base + '.prom') as file:
+        file.write(prometheus(data))
+
+@contextlib.contextmanager
+def run(job, directory=METRICS_DIR):
+    """
+    Collects metrics for one run of `job` and writes them when the block
+    exits, also when it raises. A directory of None only collects.
+    """
+    reset()
+    started_at, start = time.time(), time.perf_counter()
+    try:
+        yield
+    finally:
+        if directory:
+            try:
+                write(snapshot(job, started_at, time.perf_counter() - start), directory)
+            except OSError as e:
+                print(f"Could not write metrics for {job}: {e}")
@@ -0,0 +1,266 @@
+import asyncio
+import ssl
+import time
+from collections import defaultdict, deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+from streamstore import host_of
+import metrics
+
+# Non-blocking mirror validation engine shared by Events/events.py and
+# all_channels/main.py.
+#
+# Every channel id has the same stream on several mirror hosts. Each id
+# probes its mirrors in the order ranked by the StreamStore, with at most
+# `top_k` probes of one id in flight; the first 200 settles the id and its
+# sibling probes are cancelled.
+#
+# Probes are plain HEAD (then GET) requests issued with asyncio streams, so
+# thousands can be in flight on one core. Every mirror host has its own
+# HostLimiter: a token bucket for the request rate, an AIMD concurrency
+# window (+1 per window of successes, halved on 429/503) and a pause that
+# honours Retry-After. A throttling mirror therefore slows down only its own
+# probes instead of parking worker threads in time.sleep().
+
+TOP_K = 2                   # probes of one id raced concurrently
+MAX_INFLIGHT = 500          # probes in flight across all hosts
+HOST_RATE = 50.0            # requests per second per host (token refill)
+HOST_BURST = 20             # token bucket size
+HOST_WINDOW = 8             # initial concurrent probes per host
+HOST_MAX_WINDOW = 64
+RETRY_AFTER = 5.0           # pause when a 429/503 carries no Retry-After
+TIMEOUT = 10.0
+ATTEMPTS = 3
+MAX_REDIRECTS = 5
+
+FINAL_STATUSES = (200, 404, 410)
+THROTTLE_STATUSES = (429, 503)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_ssl_context = None
+
+def parse_retry_after(value, now=None):
+    """
+    Returns the Retry-After header value in seconds, or None.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+class HostLimiter:
+    """
+    Rate and concurrency control for one mirror host.
+    """
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST, window=HOST_WINDOW, max_window=HOST_MAX_WINDOW):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.window = float(window)
+        self.max_window = max_window
+        self.active = 0
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self.freed = asyncio.Event()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Runs on the event loop thread only, so the check-and-take below
+        # needs no lock; waiters simply re-check after every wake-up.
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+            elif self.active >= int(self.window):
+                self.freed.clear()
+                await self.freed.wait()
+            elif self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+            else:
+                self.tokens -= 1
+                self.active += 1
+                return
+
+    def release(self, status, retry_after=None):
+        self.active -= 1
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            self.window = max(1.0, self.window / 2)
+            pause = RETRY_AFTER if retry_after is None else retry_after
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        elif status:
+            self.window = min(self.max_window, self.window + 1 / self.window)
+        self.freed.set()
+
+async def _request(method, url, headers, timeout):
+    """
+    Sends one request and reads only the status line and headers.
+
+    Returns:
+    tuple: (status, {lower-cased header: value})
+    """
+    global _ssl_context
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    if secure and _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=_ssl_context if secure else None), timeout)
+    try:
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {parts.netloc}',
+                 'Connection: close', 'Accept-Encoding: identity']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+        return status, response_headers
+    finally:
+        writer.close()
+
+class Engine:
+    """
+    Shared state of one validation run: host limiters, the global in-flight
+    cap and request counters.
+    """
+    def __init__(self, headers=None, max_inflight=MAX_INFLIGHT, timeout=TIMEOUT, limiter_factory=HostLimiter):
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.inflight = asyncio.Semaphore(max_inflight)
+        self.limiters = defaultdict(limiter_factory)
+        self.requests = 0
+
+    async def _send(self, method, url):
+        host = host_of(url)
+        limiter = self.limiters[host]
+        await limiter.acquire()
+        status, headers, retry_after = 0, {}, None
+        sent = cancelled = False
+        try:
+            async with self.inflight:
+                self.requests += 1
+                sent = True
+                status, headers = await _request(method, url, self.headers, self.timeout)
+            retry_after = parse_retry_after(headers.get('retry-after'))
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+            status = 0
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            limiter.release(status, retry_after)
+            # probes the race cancelled before sending are not requests, and
+            # a cancelled request is not an error of its host
+            if sent:
+                metrics.count(host, requests=1, errors=int(not cancelled and (status == 0 or status >= 400)))
+        return status, headers
+
+    async def _follow(self, method, url):
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers = await self._send(method, url)
+            if status not in REDIRECT_STATUSES or 'location' not in headers:
+                return status
+            url = urljoin(url, headers['location'])
+        return status
+
+    async def probe(self, url):
+        """
+        HEAD (then GET) probe -> (final status, seconds); status 0 = network error.
+        Throttled attempts are retried once the host's pause has passed.
+        """
+        start, status = time.monotonic(), 0
+        for _ in range(ATTEMPTS):
+            status = await self._follow('HEAD', url)
+            if status in FINAL_STATUSES or status == 0:
+                break
+            if status in THROTTLE_STATUSES:
+                continue
+            status = await self._follow('GET', url)
+            if status in FINAL_STATUSES:
+                break
+        return status, time.monotonic() - start
+
+    async def race(self, cid, urls, store, top_k, first_only):
+        """
+        Probes one id's mirrors, top_k at a time, and returns the working ones.
+        """
+        queue = deque(urls)
+        pending = {}
+        working = []
+        try:
+            while queue or pending:
+                while queue and len(pending) < top_k:
+                    url = queue.popleft()
+                    pending[asyncio.ensure_future(self.probe(url))] = url
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = pending.pop(task)
+                    status, latency = task.result()
+                    store.record(cid, url, status, latency)
+                    if status == 200:
+                        working.append(url)
+                if working and first_only:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        return working[:1] if first_only else working
+
+async def _race_all(ids, store, templates, headers, top_k, max_inflight, first_only):
+    engine = Engine(headers, max_inflight)
+    results = {}
+    jobs = {}
+    for cid in ids:
+        known, to_probe = store.plan(cid, templates)
+        results[cid] = known[:1] if first_only else known
+        if not (known and first_only) and to_probe:
+            jobs[cid] = engine.race(cid, to_probe, store, top_k, first_only)
+
+    found = await asyncio.gather(*jobs.values())
+    for cid, urls in zip(jobs, found):
+        results[cid] = results[cid] + urls
+    return results, engine
+
+def race_all(ids, store, templates, headers=None, top_k=TOP_K, max_inflight=MAX_INFLIGHT, first_only=True):
+    """
+    Finds working mirror URLs for every channel id.
+
+    Parameters:
+    ids (iterable): Channel ids substituted into the templates' {num}.
+    store (StreamStore): Probe history used for planning and recording.
+    templates (list): Mirror URL templates.
+    headers (dict): Request headers sent with every probe.
+    top_k (int): Probes of one id raced at once.
+    max_inflight (int): Concurrent probes across all hosts.
+    first_only (bool): Stop an id at its first working mirror. When False
+                       every mirror not known from the store is probed.
+
+    Returns:
+    dict: {id: [working urls]}, ids without a working mirror map to [].
+    """
+    if not first_only:
+        top_k = len(templates)
+    results, _ = asyncio.run(_race_all(ids, store, templates, headers, top_k, max_inflight, first_only))
+    return results
@@ -0,0 +1,194 @@
+import cProfile
+import contextlib
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+import metrics
+
+# Opt-in profiling of one run, split by metrics stage.
+#
+#   with profiling.session('cprofile', 'profile'):
+#       ...                                  # stages from metrics.stage/timed
+#
+# 'cprofile' keeps one cProfile.Profile per stage and switches between them
+# as stages are entered and left, so each <stage>.pstats holds the calls
+# made in that stage but not in a stage nested inside it. It is exact but
+# slows pure-Python code down noticeably.
+#
+# 'sample' is cheap enough for production runs: a background thread looks
+# at the main thread's stack every `interval` seconds and counts the stacks
+# per stage in <stage>.collapsed ("outer;inner;leaf count" lines, the input
+# of flamegraph.pl and speedscope).
+#
+# Both modes write <stage>.txt with the top functions, and slowest_calls.json
+# with the slowest calls recorded through call() (e.g. one entry per
+# channel name matched). Only the thread that opened the session is
+# profiled; stages run by worker threads are left out.
+
+MODES = ('cprofile', 'sample')
+DEFAULT_INTERVAL = 0.005
+TOP_FUNCTIONS = 40
+SLOWEST_CALLS = 25
+OUTSIDE = '_run'            # name used for time outside any stage
+
+_active = None
+
+def _file_name(stage):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in stage)
+
+class _Profiler:
+    def __init__(self, directory):
+        self.directory = directory
+        self.thread_id = threading.get_ident()
+        self.stack = [OUTSIDE]
+        self.calls = {}
+        self.calls_lock = threading.Lock()
+
+    def enter(self, name):
+        if threading.get_ident() == self.thread_id:
+            self.switch(self.stack[-1], name)
+            self.stack.append(name)
+
+    def exit(self, name):
+        if threading.get_ident() == self.thread_id and len(self.stack) > 1:
+            self.stack.pop()
+            self.switch(name, self.stack[-1])
+
+    def switch(self, old, new):
+        pass
+
+    def record_call(self, kind, key, seconds):
+        with self.calls_lock:
+            self.calls.setdefault(kind, []).append((seconds, key))
+
+    def start(self):
+        self.switch(None, OUTSIDE)
+
+    def stop(self):
+        self.switch(OUTSIDE, None)
+
+    def write(self):
+        slowest = {kind: [{'seconds': round(s, 6), 'key': key}
+                          for s, key in sorted(calls, key=lambda call: -call[0])[:SLOWEST_CALLS]]
+                   for kind, calls in self.calls.items()}
+        with open(os.path.join(self.directory, 'slowest_calls.json'), 'w', encoding='utf-8') as file:
+            json.dump(slowest, file, indent=2, ensure_ascii=False)
+        return slowest
+
+class _CProfiler(_Profiler):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.profiles = {}
+
+    def switch(self, old, new):
+        if old is not None:
+            self.profiles[old].disable()
+        if new is not None:
+            self.profiles.setdefault(new, cProfile.Profile()).enable()
+
+    def write(self):
+        for stage, profile in self.profiles.items():
+            base = os.path.join(self.directory, _file_name(stage))
+            profile.dump_stats(base + '.pstats')
+            out = io.StringIO()
+            stats = pstats.Stats(profile, stream=out)
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            with open(base + '.txt', 'w', encoding='utf-8') as file:
+                file.write(out.getvalue())
+        return super().write()
+
+class _Sampler(_Profiler):
+    def __init__(self, directory, interval=DEFAULT_INTERVAL):
+        super().__init__(directory)
+        self.interval = interval
+        self.samples = Counter()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiling-sampler', daemon=True)
+
+    def run(self):
+        labels = {}
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                names.append(label)
+                frame = frame.f_back
+            self.samples[self.stack[-1], ';'.join(reversed(names))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+
+    def write(self):
+        by_stage = {}
+        for (stage, stack), count in self.samples.items():
+            by_stage.setdefault(stage, []).append((stack, count))
+        for stage, stacks in by_stage.items():
+            base = os.path.join(self.directory, _file_name(stage))
+            with open(base + '.collapsed', 'w', encoding='utf-8') as file:
+                for stack, count in sorted(stacks):
+                    file.write(f'{stack} {count}\n')
+            # leaf functions by sample count, the quick look without a flame graph
+            leaves = Counter()
+            for stack, count in stacks:
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            total = sum(leaves.values())
+            with open(base + '.txt', 'w', encoding='utf-8') as file:
+                file.write(f'{total} samples every {self.interval * 1000:g} ms in {stage}\n\n')
+                for leaf, count in leaves.most_common(TOP_FUNCTIONS):
+                    file.write(f'{count:8d} {count / total * 100:5.1f}%  {leaf}\n')
+        return super().write()
+
+@contextlib.contextmanager
+def session(mode, directory, interval=DEFAULT_INTERVAL):
+    """
+    Profiles the block in `mode` ('cprofile' or 'sample') and writes the
+    results to `directory`. Yields the slowest-calls dict, filled on exit.
+    """
+    global _active
+    if mode not in MODES:
+        raise ValueError(f'unknown profiling mode {mode!r}, expected one of {MODES}')
+    os.makedirs(directory, exist_ok=True)
+    profiler = _CProfiler(directory) if mode == 'cprofile' else _Sampler(directory, interval)
+    slowest = {}
+    _active = profiler
+    metrics.add_listener(profiler)
+    profiler.start()
+    try:
+        yield slowest
+    finally:
+        profiler.stop()
+        metrics.remove_listener(profiler)
+        _active = None
+        slowest.update(profiler.write())
+
+@contextlib.contextmanager
+def _timed_call(profiler, kind, key):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_call(kind, key, time.perf_counter() - start)
+
+def call(kind, key):
+    """
+    Times one call of `kind` (e.g. 'find_best_epg_match') for `key` (e.g.
+    the channel name) when a session is open; does nothing otherwise.
+    """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _timed_call(_active, kind, key)
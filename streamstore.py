@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Persistent stream-validation store shared by Events/events.py and
+# all_channels/main.py.
+#
+# One row per (channel id, mirror host) keeps the last HTTP status, latency
+# and check time plus running ok/fail counters. Callers use it to
+#   - skip probes whose last result is younger than the TTL,
+#   - try historically good mirrors first,
+#   - stop probing an id once one mirror is confirmed working.
+
+DB_FILE = os.environ.get('IPTV_STREAM_DB', 'stream_health.sqlite')
+DEFAULT_TTL = 12 * 3600
+DEAD_STATUSES = (404, 410)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    cid         TEXT    NOT NULL,
+    host        TEXT    NOT NULL,
+    status      INTEGER NOT NULL,
+    latency     REAL    NOT NULL,
+    checked_at  REAL    NOT NULL,
+    ok_count    INTEGER NOT NULL DEFAULT 0,
+    fail_count  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cid, host)
+)
+"""
+
+def host_of(url):
+    return urlsplit(url).hostname or ''
+
+class StreamStore:
+    """
+    SQLite-backed probe history. Safe to share between worker threads.
+
+    Parameters:
+    path (str): Database file, created on first use.
+    ttl (int): Seconds a recorded 200/404/410 is trusted without re-probing.
+    """
+    def __init__(self, path=DB_FILE, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(_SCHEMA)
+        self.db.commit()
+        self._host_scores = self._load_host_scores()
+
+    def _load_host_scores(self):
+        rows = self.db.execute(
+            'SELECT host, SUM(ok_count), SUM(fail_count), AVG(latency) FROM probes GROUP BY host'
+        ).fetchall()
+        # Laplace-smoothed success rate, ties broken by lower latency
+        return {host: ((ok + 1) / (ok + fail + 2), -(lat or 0)) for host, ok, fail, lat in rows}
+
+    def history(self, cid):
+        """
+        Returns {host: (status, latency, checked_at)} for a channel id.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT host, status, latency, checked_at FROM probes WHERE cid = ?', (str(cid),)
+            ).fetchall()
+        return {host: (status, latency, checked_at) for host, status, latency, checked_at in rows}
+
+    def plan(self, cid, templates, now=None):
+        """
+        Decides what to probe for a channel id.
+
+        Parameters:
+        cid (str): The channel id.
+        templates (list): URL templates with a {num} placeholder.
+
+        Returns:
+        tuple: (known, to_probe) where known are URLs confirmed working
+               within the TTL and to_probe are the remaining candidate URLs,
+               best host first. URLs recently confirmed dead are left out.
+        """
+        now = time.time() if now is None else now
+        history = self.history(cid)
+        known, to_probe = [], []
+
+        for template in templates:
+            url = template.format(num=cid)
+            entry = history.get(host_of(url))
+            if entry and now - entry[2] < self.ttl:
+                if entry[0] == 200:
+                    known.append(url)
+                    continue
+                if entry[0] in DEAD_STATUSES:
+                    continue
+            to_probe.append(url)
+
+        def score(url):
+            entry = history.get(host_of(url))
+            own = 1 if entry and entry[0] == 200 else 0
+            return (own,) + self._host_scores.get(host_of(url), (0.5, 0))
+
+        to_probe.sort(key=score, reverse=True)
+        return known, to_probe
+
+    def record(self, cid, url, status, latency, now=None):
+        """
+        Stores the outcome of one probe. status 0 means a network error.
+        """
+        now = time.time() if now is None else now
+        ok = 1 if status == 200 else 0
+        with self.lock:
+            self.db.execute(
+                """
+                INSERT INTO probes (cid, host, status, latency, checked_at, ok_count, fail_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cid, host) DO UPDATE SET
+                    status = excluded.status,
+                    latency = excluded.latency,
+                    checked_at = excluded.checked_at,
+                    ok_count = ok_count + excluded.ok_count,
+                    fail_count = fail_count + excluded.fail_count
+                """,
+                (str(cid), host_of(url), status, latency, now, ok, 1 - ok),
+            )
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,27 @@
+import heapq
+import html
 import json
-from bs4 import BeautifulSoup
+import mmap
+import os
+import re
+
+NGRAM = 3
+TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+
+REACT_APP_TAG = re.compile(rb'<react-app\b[^>]*>', re.I)
+INITIAL_PATH_ATTR = re.compile(rb'\sinitial-path\s*=\s*"([^"]*)"', re.I)
+EMBEDDED_DATA_TAG = re.compile(rb'<script\b[^>]*\sdata-target\s*=\s*"react-app\.embeddedData"[^>]*>', re.I)
+SCRIPT_JSON_TYPE = re.compile(rb'\stype\s*=\s*"application/json"', re.I)
 
 def extract_payload_from_file(file_path):
     """
     Extracts the payload object from the provided HTML file.
 
+    The page is scanned for the two nodes that are needed, the <react-app>
+    tag and its embedded JSON <script>, without parsing the rest of the
+    document. When either cannot be found that way the whole page is parsed
+    with BeautifulSoup instead.
+
     Parameters:
     file_path (str): The path to the HTML file.
 
@@ -12,39 +29,10 @@ def extract_payload_from_file(file_path):
     dict: The payload object as a dictionary.
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-
-        # Parse the HTML content with BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # Extract the initial path
-        react_app_tag = soup.find('react-app')
-        if react_app_tag:
-            initial_path = react_app_tag['initial-path']
-            if initial_path:
-                initial_path = initial_path.split('/tv-logo/tv-logos/tree/main/')[0] + '/tv-logo/tv-logos/tree/main/'
-                initial_path = initial_path.replace('/tree', '')
-
-        # Find the script tag with the payload
-        script_tag = soup.find('script', {'type': 'application/json', 'data-target': 'react-app.embeddedData'})
-
-        if script_tag:
-            # Extract the JSON content from the script tag
-            json_content = script_tag.string
-            # Load it into a Python dictionary
-            data = json.loads(json_content)
-            # Extract the payload object
-            payload = data.get('payload', {})
-
-            # Append the initial path to the payload object
-            if initial_path:
-                payload['initial_path'] = initial_path
-
-            return payload
-        else:
-            print('Script tag with the payload not found.')
-            return {}
+        payload = scan_payload_from_file(file_path)
+        if payload is None:
+            payload = parse_payload_from_file(file_path)
+        return payload
 
     except FileNotFoundError:
         print(f'The file {file_path} does not exist.')
@@ -53,30 +41,187 @@ def extract_payload_from_file(file_path):
         print(f'An error occurred: {e}')
         return {}
 
+def _initial_path(initial_path):
+    initial_path = initial_path.split('/tv-logo/tv-logos/tree/main/')[0] + '/tv-logo/tv-logos/tree/main/'
+    return initial_path.replace('/tree', '')
+
+def scan_payload_from_file(file_path):
+    """
+    Fast path of extract_payload_from_file. The file is memory-mapped and
+    searched with byte patterns, so only the pages around the two nodes are
+    ever decoded.
+
+    Returns:
+    dict: The payload, or None when the page does not have the expected shape.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as page:
+            react_app = REACT_APP_TAG.search(page)
+            script = EMBEDDED_DATA_TAG.search(page)
+            if not script or not SCRIPT_JSON_TYPE.search(script.group(0)):
+                return None
+            end = page.find(b'</script>', script.end())
+            if end < 0:
+                return None
+            try:
+                data = json.loads(page[script.end():end])
+            except ValueError:
+                return None
+            initial_path = None
+            if react_app:
+                attribute = INITIAL_PATH_ATTR.search(react_app.group(0))
+                if attribute:
+                    initial_path = html.unescape(attribute.group(1).decode('utf-8'))
+
+    payload = data.get('payload', {})
+    if initial_path:
+        payload['initial_path'] = _initial_path(initial_path)
+    return payload
+
+def parse_payload_from_file(file_path):
+    """
+    Full BeautifulSoup parse of the page; the fallback of extract_payload_from_file.
+    """
+    from bs4 import BeautifulSoup
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        html_content = file.read()
+
+    # Parse the HTML content with BeautifulSoup
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Extract the initial path
+    initial_path = None
+    react_app_tag = soup.find('react-app')
+    if react_app_tag:
+        initial_path = react_app_tag.get('initial-path')
+
+    # Find the script tag with the payload
+    script_tag = soup.find('script', {'type': 'application/json', 'data-target': 'react-app.embeddedData'})
+
+    if script_tag:
+        # Extract the JSON content from the script tag
+        json_content = script_tag.string
+        # Load it into a Python dictionary
+        data = json.loads(json_content)
+        # Extract the payload object
+        payload = data.get('payload', {})
+
+        # Append the initial path to the payload object
+        if initial_path:
+            payload['initial_path'] = _initial_path(initial_path)
+
+        return payload
+    else:
+        print('Script tag with the payload not found.')
+        return {}
+
+class LogoSearchIndex:
+    """
+    Search index over the tree.items of a tv-logos payload, built once and
+    queried per channel.
+
+    Every logo name is indexed by its tokens (split on anything that is not
+    a letter or digit) and by its 1-, 2- and 3-grams. A search word of up to
+    three characters is answered straight from the n-gram postings; a longer
+    word intersects the postings of its trigrams, rarest first, and only the
+    few candidates left are checked with a substring test.
+    """
+    def __init__(self, items):
+        self.items = items
+        self.names = [item['name'].lower() for item in items]
+        self.tokens = {}
+        self.grams = {}
+
+        for i, name in enumerate(self.names):
+            for token in set(TOKEN_SPLIT.split(name)):
+                if token:
+                    self.tokens.setdefault(token, []).append(i)
+            for gram in _ngrams(name):
+                self.grams.setdefault(gram, []).append(i)
+
+    @classmethod
+    def from_payload(cls, json_obj):
+        return cls(json_obj.get('tree', {}).get('items', []))
+
+    def containing(self, word):
+        """
+        Returns the indexes of all names containing `word`, in tree order.
+        """
+        if len(word) <= NGRAM:
+            return self.grams.get(word, [])
+
+        postings = sorted((self.grams.get(word[i:i + NGRAM], []) for i in range(len(word) - NGRAM + 1)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        return sorted(i for i in candidates if word in self.names[i])
+
+    def search(self, search_string, limit=None):
+        """
+        Finds logos matching any word of the search string.
+
+        Parameters:
+        search_string (str): The words to search for.
+        limit (int): Maximum number of results, all when None.
+
+        Returns:
+        list: [{'id': item, 'source': ''}, ...] best match first, each logo once.
+              A name scores per matching word: 1 for a substring, +1 when it
+              starts with the word and +2 when the word is a whole token.
+              Ties keep the tree order.
+        """
+        scores = {}
+        for word in set(search_string.lower().split()):
+            whole = set(self.tokens.get(word, ()))
+            for i in self.containing(word):
+                score = 1
+                if self.names[i].startswith(word):
+                    score += 1
+                if i in whole:
+                    score += 2
+                scores[i] = scores.get(i, 0) + score
+
+        def key(i):
+            return (-scores[i], i)
+        if limit is None:
+            ranked = sorted(scores, key=key)
+        else:
+            ranked = heapq.nsmallest(limit, scores, key=key)
+        return [{'id': self.items[i], 'source': ''} for i in ranked]
+
+def _ngrams(name):
+    grams = set()
+    for n in range(1, NGRAM + 1):
+        for i in range(len(name) - n + 1):
+            grams.add(name[i:i + n])
+    return grams
+
+_last_index = (None, None)
+
 def search_tree_items(search_string, json_obj):
     """
     Searches the JSON object's tree.items for matches of each part of the search string.
 
+    The search index is built on the first call for a payload and reused for
+    the following calls with the same payload.
+
     Parameters:
     search_string (str): The string to search for.
     json_obj (dict): The JSON object to search within.
 
     Returns:
-    list: A list of matches found.
+    list: A list of matches found, best match first.
     """
-    matches = []
-    search_words = search_string.lower().split()
-
+    global _last_index
     items = json_obj.get('tree', {}).get('items', [])
-
-    for item in items:
-        imgName = item['name'].lower()
-        for word in search_words:
-            if word in imgName:
-                if imgName not in matches:
-                    matches.append({'id':item, 'source':''})
-
-    return matches
+    if _last_index[0] is not items:
+        _last_index = (items, LogoSearchIndex(items))
+    return _last_index[1].search(search_string)
 
 # Example usage
 if __name__ == "__main__":
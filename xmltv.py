@@ -0,0 +1,77 @@
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+from atomicfile import AtomicFile
+
+# Incremental XMLTV writer. Elements are serialized as soon as they are
+# added, so a guide is written in constant memory instead of being built
+# up as one ElementTree first. Output goes through AtomicFile: the file
+# only appears once the closing </tv> has been written.
+
+XML_HEADER = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+class Writer:
+    """
+    Streams a <tv> document.
+
+    Parameters:
+    path (str): Output file; a '.gz' path is gzipped on the fly.
+    compress (bool): Force gzip on or off regardless of the file name.
+    attrs (dict): Attributes of the <tv> root element.
+
+        with xmltv.Writer('guide.xml') as guide:
+            guide.channel('id', 'Name', icon='https://...')
+            guide.programme('20250101000000 +0000', '20250102000000 +0000', 'id', 'Title')
+    """
+    def __init__(self, path, compress=None, attrs=None):
+        self.path = path
+        self.channels = 0
+        self.programmes = 0
+        self.out = AtomicFile(path, compress=compress)
+        self.out.write(XML_HEADER + '<tv' + _attrs(attrs or {}) + '>\n')
+
+    def channel(self, channel_id, display_name, icon=None):
+        """
+        Writes a <channel> with one display-name and an optional icon.
+        """
+        text = f'<channel id={quoteattr(channel_id)}><display-name>{escape(display_name)}</display-name>'
+        if icon:
+            text += f'<icon src={quoteattr(icon)} />'
+        self.out.write(text + '</channel>\n')
+        self.channels += 1
+
+    def programme(self, start, stop, channel_id, title, desc=None):
+        """
+        Writes a <programme> with a title and an optional description.
+        """
+        text = (f'<programme start={quoteattr(start)} stop={quoteattr(stop)} channel={quoteattr(channel_id)}>'
+                f'<title>{escape(title)}</title>')
+        if desc is not None:
+            text += f'<desc>{escape(desc)}</desc>'
+        self.out.write(text + '</programme>\n')
+        self.programmes += 1
+
+    def element(self, elem):
+        """
+        Writes an already built ElementTree element.
+        """
+        elem.tail = '\n'
+        self.out.write(ET.tostring(elem, encoding='unicode'))
+
+    def close(self):
+        self.out.write('</tv>\n')
+        self.out.close()
+
+    def discard(self):
+        self.out.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+def _attrs(attrs):
+    return ''.join(f' {key}={quoteattr(str(value))}' for key, value in attrs.items())